@@ -1,7 +1,11 @@
 # coding=utf-8
 
 import os
-import pickle
+import shutil
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 
 class Cache(object):
@@ -52,6 +56,18 @@ class Cache(object):
         with open(os.path.join('data', name), 'wb') as f:
             f.write(content)
 
+    @staticmethod
+    def copy_file(name, source):
+        """Function to write cache
+
+        Copies a file (source) to a file with an indicated name on the hard
+        drive, without reading it into memory as a whole.
+
+        """
+        if not os.path.isdir('data'):
+            os.mkdir('data')
+        shutil.copyfile(source, os.path.join('data', name))
+
     @staticmethod
     def read_file(name):
         """Function to read cache
@@ -68,3 +84,18 @@ class Cache(object):
                 return f.read()
         else:
             return dict()
+
+    @staticmethod
+    def open_file(name):
+        """Function to open a cached file for reading
+
+        Opens a file with an indicated name on the hard drive, to be read
+        incrementally.
+
+        :return file: The opened file object, or None in case no file was
+            found
+        """
+        filename = os.path.join('data', name)
+        if os.path.isfile(filename):
+            return open(filename, 'rb')
+        return None
@@ -5,9 +5,10 @@ import sys
 import logging
 import json
 import datetime
-from urllib2 import urlopen
+import hashlib
 from calendar import monthrange
 from osm2gtfs.core.cache import Cache
+from osm2gtfs.core.http_client import HttpClient
 
 
 class Configuration(object):
@@ -36,12 +37,18 @@ class Configuration(object):
 
         # Initiate variable for schedule source information
         self._schedule_source = None
+        self._schedule_source_hash = None
+
+        # Client for downloads of schedule source information, with the same
+        # rate limit and retries as the queries
+        self.http_client = HttpClient.from_config(self.data.get('query', {}))
 
     def get_schedule_source(self, refresh=False):
         """Loads the schedule source information.
 
-        Loads a schedule source file from either a path or a url specified
-        in the config file
+        Loads the cached schedule source file into memory. It gets cached
+        first from either a path or a url specified in the config file, see
+        refresh_schedule_source.
 
         :return schedule_source: The schedule read from a file.
 
@@ -50,44 +57,134 @@ class Configuration(object):
         if 'schedule_source' not in self.data:
             return None
 
+        cached_file = self.data['selector'] + '-schedule'
+
+        # Preferably return cached data about schedule
+        if refresh is False:
+            # Check if _schedule_source data is already present
+            if not self._schedule_source:
+                # If not, try to get _schedule_source from file cache
+                self._schedule_source = Cache.read_file(cached_file)
+            # Return cached data if found
+            if bool(self._schedule_source):
+                return self._schedule_source
+
+        # No cached data was found or refresh was forced
+        self.refresh_schedule_source()
+        self._schedule_source = Cache.read_file(cached_file)
+        return self._schedule_source
+
+    def refresh_schedule_source(self):
+        """Updates the cached schedule source information
+
+        The schedule source is copied from a path or downloaded from a url
+        specified in the config file into the file cache, without loading
+        the cached file into memory. Downloads are conditional: the
+        validators (ETag, Last-Modified) of the cached file are sent along,
+        so an unchanged file is not transferred again.
+
+        """
+        if 'schedule_source' not in self.data:
+            return
+
+        source_file = self.data['schedule_source']
+        cached_file = self.data['selector'] + '-schedule'
+        logging.info("Load schedule source information from %s", source_file)
+        self._schedule_source = None
+        self._schedule_source_hash = None
+
+        # Check if local file exists
+        if os.path.isfile(source_file):
+            Cache.copy_file(cached_file, source_file)
         else:
-            source_file = self.data['schedule_source']
-            cached_file = self.data['selector'] + '-schedule'
+            schedule_source = self._download_schedule_source(source_file, cached_file)
+            # Otherwise cached data is still up to date
+            if schedule_source is not None:
+                Cache.write_file(cached_file, schedule_source)
 
-            # Preferably return cached data about schedule
-            if refresh is False:
-                # Check if _schedule_source data is already present
-                if not self._schedule_source:
-                    # If not, try to get _schedule_source from file cache
-                    self._schedule_source = Cache.read_file(cached_file)
-                # Return cached data if found
-                if bool(self._schedule_source):
-                    return self._schedule_source
+    def open_schedule_source(self):
+        """Opens the cached schedule source information for reading
 
-            # No cached data was found or refresh was forced
-            logging.info("Load schedule source information from %s", source_file)
+        In contrast to get_schedule_source, the schedule source doesn't get
+        loaded into memory, when it is already cached.
 
-            # Check if local file exists
-            if os.path.isfile(source_file):
+        :return schedule_source_file: File object or None
 
-                # Open file and add to config object
-                with open(source_file, 'r') as f:
-                    schedule_source = f.read()
+        """
+        if 'schedule_source' not in self.data:
+            return None
 
-            else:
-                # Check if it is a valid url
-                try:
-                    schedule_source_file = urlopen(source_file)
-                except ValueError:
-                    logging.error("Couldn't find schedule_source file.")
-                    sys.exit(0)
-                schedule_source = schedule_source_file.read()
-
-        self._schedule_source = schedule_source
-
-        # Cache data
-        Cache.write_file(cached_file, self._schedule_source)
-        return self._schedule_source
+        cached_file = self.data['selector'] + '-schedule'
+        schedule_source_file = Cache.open_file(cached_file)
+        if schedule_source_file is None:
+            self.refresh_schedule_source()
+            schedule_source_file = Cache.open_file(cached_file)
+        return schedule_source_file
+
+    def get_schedule_source_hash(self):
+        """Returns a hash of the schedule source information, which allows
+        later steps to recognize an unchanged schedule
+
+        :return hash: Hex digest of the schedule source, or None
+
+        """
+        if self._schedule_source_hash is None:
+            schedule_source_file = self.open_schedule_source()
+            if schedule_source_file is not None:
+                # Hash the cached file in chunks, without loading it at once
+                source_hash = hashlib.sha1()
+                with schedule_source_file:
+                    for chunk in iter(lambda: schedule_source_file.read(65536), ''):
+                        source_hash.update(chunk)
+                self._schedule_source_hash = source_hash.hexdigest()
+        return self._schedule_source_hash
+
+    def _download_schedule_source(self, url, cached_file):
+        """Helper function to download the schedule source information
+
+        :return schedule_source: The downloaded file or None, if the cached
+            file didn't change
+
+        """
+        # Validators of the cached file
+        validators = Cache.read_data(cached_file + '-validators')
+        is_cached = (validators.get('url') == url and
+                     os.path.isfile(os.path.join('data', cached_file)))
+        headers = {}
+        if is_cached:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        # Check if it is a valid url
+        try:
+            response = self.http_client.get(url, headers)
+        except ValueError:
+            logging.error("Couldn't find schedule_source file.")
+            sys.exit(0)
+
+        if response.status == 304:
+            logging.info("Schedule source information didn't change")
+            return None
+        elif response.status != 200:
+            logging.error("Couldn't download schedule_source file (status %s).",
+                          response.status)
+            sys.exit(0)
+
+        source_hash = hashlib.sha1(response.body).hexdigest()
+        Cache.write_data(cached_file + '-validators', {
+            'url': url,
+            'etag': response.headers.get('etag'),
+            'last_modified': response.headers.get('last-modified'),
+            'hash': source_hash,
+        })
+        if is_cached and validators.get('hash') == source_hash:
+            logging.info("Schedule source information didn't change")
+            return None
+
+        self._schedule_source_hash = source_hash
+        return response.body
 
     def _load_config(self, args):
         """Loads the configuration. Either the standard location
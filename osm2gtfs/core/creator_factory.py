@@ -1,13 +1,7 @@
 # coding=utf-8
 
-import importlib
 import logging
-from osm2gtfs.creators.agency_creator import AgencyCreator
-from osm2gtfs.creators.feed_info_creator import FeedInfoCreator
-from osm2gtfs.creators.routes_creator import RoutesCreator
-from osm2gtfs.creators.stops_creator import StopsCreator
-from osm2gtfs.creators.schedule_creator import ScheduleCreator
-from osm2gtfs.creators.trips_creator import TripsCreator
+from osm2gtfs.core.creator_registry import CreatorRegistry
 
 
 class CreatorFactory(object):
@@ -28,106 +22,32 @@ class CreatorFactory(object):
         return rep
 
     def get_agency_creator(self):
-        selector = self.selector
-
-        try:
-            module = importlib.import_module(
-                ".creators." + selector + ".agency_creator_" + selector,
-                package="osm2gtfs")
-            agency_creator_override = getattr(
-                module, "AgencyCreator" + self._generate_class_name(selector))
-            logging.info("Agency creator: %s", selector)
-            return agency_creator_override(self.config)
-        except ImportError:
-            logging.info("Agency creator: Default")
-            return AgencyCreator(self.config)
+        return self._get_creator("agency")
 
     def get_feed_info_creator(self):
-        selector = self.selector
-
-        try:
-            module = importlib.import_module(
-                ".creators." + selector + ".feed_info_creator_" + selector,
-                package="osm2gtfs")
-            feed_info_creator_override = getattr(
-                module, "FeedInfoCreator" + self._generate_class_name(selector))
-            logging.info("Feed info creator: %s", selector)
-            return feed_info_creator_override(self.config)
-        except ImportError:
-            logging.info("Feed info creator: Default")
-            return FeedInfoCreator(self.config)
+        return self._get_creator("feed_info")
 
     def get_routes_creator(self):
-        selector = self.selector
-
-        try:
-            module = importlib.import_module(
-                ".creators." + selector + ".routes_creator_" + selector,
-                package="osm2gtfs")
-            routes_creator_override = getattr(
-                module, "RoutesCreator" + self._generate_class_name(selector))
-            logging.info("Routes creator: %s", selector)
-            return routes_creator_override(self.config)
-        except ImportError:
-            logging.info("Routes creator: Default")
-            return RoutesCreator(self.config)
+        return self._get_creator("routes")
 
     def get_stops_creator(self):
-        selector = self.selector
-
-        try:
-            module = importlib.import_module(
-                ".creators." + selector + ".stops_creator_" + selector,
-                package="osm2gtfs")
-            stops_creator_override = getattr(
-                module, "StopsCreator" + self._generate_class_name(selector))
-            logging.info("Stops creator: %s", selector)
-            return stops_creator_override(self.config)
-        except ImportError:
-            logging.info("Stops creator: Default")
-            return StopsCreator(self.config)
+        return self._get_creator("stops")
 
     def get_schedule_creator(self):
-        selector = self.selector
-
-        try:
-            module = importlib.import_module(
-                ".creators." + selector + ".schedule_creator_" + selector,
-                package="osm2gtfs")
-            schedule_creator_override = getattr(
-                module, "ScheduleCreator" + self._generate_class_name(selector))
-            logging.info("Schedule creator: %s", selector)
-            return schedule_creator_override(self.config)
-        except ImportError:
-            logging.info("Schedule creator: Default")
-            return ScheduleCreator(self.config)
+        return self._get_creator("schedule")
 
     def get_trips_creator(self):
-        selector = self.selector
-
-        try:
-            module = importlib.import_module(
-                ".creators." + selector + ".trips_creator_" + selector,
-                package="osm2gtfs")
-            trips_creator_override = getattr(
-                module, "TripsCreator" + self._generate_class_name(selector))
-            logging.info("Trips creator: %s", selector)
-            return trips_creator_override(self.config)
-        except ImportError:
-            logging.info("Trips creator: Default")
-            return TripsCreator(self.config)
+        return self._get_creator("trips")
 
-    @staticmethod
-    def _generate_class_name(selector):
+    def _get_creator(self, kind):
         """
-        Converts the underscore selector into class names sticking to Python's
-        naming convention.
+        Instantiates the creator of a kind, as provided by the selector or the
+        default one.
         """
-        if "_" in selector:
-            split_selector = selector.split("_")
-            class_name = str()
-            for part in split_selector:
-                class_name += part.capitalize()
+        creator_class, is_default = CreatorRegistry.get_creator_class(kind, self.selector)
+        label = kind.replace("_", " ").capitalize()
+        if is_default:
+            logging.info("%s creator: Default", label)
         else:
-            class_name = selector.capitalize()
-        return class_name
+            logging.info("%s creator: %s", label, self.selector)
+        return creator_class(self.config)
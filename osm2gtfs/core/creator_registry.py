@@ -0,0 +1,119 @@
+# coding=utf-8
+
+import os
+import importlib
+import logging
+import pkgutil
+
+
+class CreatorRegistry(object):
+    """The CreatorRegistry resolves the creator classes of a selector
+
+    Creators of a selector are looked up in the sub-package of
+    osm2gtfs.creators named like the selector. Creator packages outside of
+    osm2gtfs can register themselves with an entry point of the group
+    "osm2gtfs.creators", named like the selector and pointing to a package
+    with the same layout as the ones in osm2gtfs.creators:
+
+        entry_points={
+            'osm2gtfs.creators': ['xx_city = my_package.xx_city']
+        }
+
+    All creators of a selector are resolved in one pass and cached.
+
+    """
+
+    ENTRY_POINT_GROUP = "osm2gtfs.creators"
+
+    KINDS = ['agency', 'feed_info', 'routes', 'stops', 'schedule', 'trips']
+
+    # Resolved creator classes by selector
+    _creators = {}
+
+    @classmethod
+    def get_creator_class(cls, kind, selector):
+        """Returns the creator class of a kind for a selector. Falls back to
+        the default creator class, if the selector doesn't provide one.
+
+        :param kind: One of CreatorRegistry.KINDS, like "trips"
+        :param selector: The selector of the configuration or None
+
+        :return creator_class: Class of the creator
+        :return is_default: Whether the default creator class is used
+
+        """
+        if kind not in cls.KINDS:
+            raise ValueError("Unknown kind of creator: " + str(kind))
+
+        creators = cls.get_creators(selector)
+        if kind in creators:
+            return creators[kind], False
+
+        module = importlib.import_module("osm2gtfs.creators." + kind + "_creator")
+        return getattr(module, cls.generate_class_name(kind) + "Creator"), True
+
+    @classmethod
+    def get_creators(cls, selector):
+        """Returns all creator classes a selector provides
+
+        :return creators: Dictionary of creator classes by kind
+
+        """
+        if selector not in cls._creators:
+            cls._creators[selector] = cls._resolve_creators(selector)
+        return cls._creators[selector]
+
+    @classmethod
+    def _resolve_creators(cls, selector):
+        """Helper function to import all creator modules of a selector
+
+        Only modules which actually exist get imported, so errors within them
+        are raised instead of being mistaken for missing creators.
+
+        """
+        creators = {}
+        if not selector:
+            return creators
+
+        package = cls._find_package(selector)
+        if package is None:
+            return creators
+
+        module_names = set(
+            name for _, name, _ in pkgutil.iter_modules(package.__path__))
+        for kind in cls.KINDS:
+            module_name = kind + "_creator_" + selector
+            if module_name in module_names:
+                module = importlib.import_module(package.__name__ + "." + module_name)
+                creators[kind] = getattr(
+                    module, cls.generate_class_name(kind) + "Creator" +
+                    cls.generate_class_name(selector))
+        return creators
+
+    @classmethod
+    def _find_package(cls, selector):
+        """Helper function to find the package containing the creators of a
+        selector, either within osm2gtfs or registered by an entry point
+
+        """
+        creators_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "creators")
+        if os.path.isfile(os.path.join(creators_path, selector, "__init__.py")):
+            return importlib.import_module("osm2gtfs.creators." + selector)
+
+        try:
+            import pkg_resources
+        except ImportError:
+            return None
+        for entry_point in pkg_resources.iter_entry_points(cls.ENTRY_POINT_GROUP, selector):
+            logging.info("Creators of %s are provided by %s",
+                         selector, entry_point.module_name)
+            return entry_point.load()
+        return None
+
+    @staticmethod
+    def generate_class_name(selector):
+        """
+        Converts the underscore selector into class names sticking to Python's
+        naming convention.
+        """
+        return "".join(part.capitalize() for part in selector.split("_"))
@@ -0,0 +1,111 @@
+# coding=utf-8
+
+import json
+import logging
+
+
+class Diagnostics(object):
+    """The Diagnostics class collects issues found in the data
+
+    Issues are counted by their type while building the GTFS, together with
+    the OpenStreetMap elements they were found at. Instead of logging every
+    single issue, a summary with some samples is logged at the end and a
+    complete report can be written to a file.
+
+    """
+
+    MISSING_REF = "missing_ref"
+    NON_MATCHING_WAYS = "non_matching_ways"
+    STOP_IN_TWO_STOP_AREAS = "stop_in_two_stop_areas"
+    SCHEDULE_MISMATCH = "schedule_mismatch"
+    DUPLICATE_TRIP = "duplicate_trip"
+
+    DESCRIPTIONS = {
+        MISSING_REF: "Route without 'ref'",
+        NON_MATCHING_WAYS: "Route has non-matching ways",
+        STOP_IN_TWO_STOP_AREAS: "Stop is part of two stop areas",
+        SCHEDULE_MISMATCH: "Route doesn't match with the schedule",
+        DUPLICATE_TRIP: "Trip is listed more than once in the schedule",
+    }
+
+    # Amount of elements listed for each type of issue in the summary
+    SAMPLES = 5
+
+    _issues = []
+    _counts = {}
+
+    @classmethod
+    def add(cls, issue, osm_type, osm_id, detail=None):
+        """Records an issue
+
+        :param issue: Type of the issue, like Diagnostics.MISSING_REF
+        :param osm_type: OpenStreetMap type of the affected element
+        :param osm_id: OpenStreetMap id of the affected element
+        :param detail: Optional additional information on the issue
+
+        """
+        cls._issues.append((issue, osm_type, osm_id, detail))
+        cls._counts[issue] = cls._counts.get(issue, 0) + 1
+
+    @classmethod
+    def get_count(cls, issue):
+        return cls._counts.get(issue, 0)
+
+    @classmethod
+    def reset(cls):
+        del cls._issues[:]
+        cls._counts.clear()
+
+    @classmethod
+    def get_report(cls):
+        """Returns all recorded issues
+
+        :return issues: List of dictionaries, one per issue
+
+        """
+        return [{'issue': issue, 'osm_url': cls._get_osm_url(osm_type, osm_id),
+                 'detail': detail}
+                for issue, osm_type, osm_id, detail in cls._issues]
+
+    @classmethod
+    def log_summary(cls):
+        """Logs the amount of issues by type together with some samples
+
+        """
+        if not cls._counts:
+            logging.info("No issues found in the data")
+            return
+
+        for issue in sorted(cls._counts):
+            logging.warning("%s: %s times", cls.DESCRIPTIONS.get(issue, issue),
+                            cls._counts[issue])
+            samples = [entry for entry in cls._issues if entry[0] == issue]
+            for _, osm_type, osm_id, detail in samples[:cls.SAMPLES]:
+                if detail is None:
+                    logging.warning(" %s", cls._get_osm_url(osm_type, osm_id))
+                else:
+                    logging.warning(" %s (%s)", cls._get_osm_url(osm_type, osm_id), detail)
+            if len(samples) > cls.SAMPLES:
+                logging.warning(" ...")
+
+    @classmethod
+    def write_report(cls, filename):
+        """Writes all recorded issues to a file
+
+        The file is written as JSON Lines, with one issue per line, if its name
+        ends with ".jsonl". Otherwise, a JSON object with the counts and the
+        list of issues is written.
+
+        """
+        with open(filename, "w") as report_file:
+            if filename.endswith(".jsonl"):
+                for entry in cls.get_report():
+                    report_file.write(json.dumps(entry) + "\n")
+            else:
+                json.dump({'counts': cls._counts, 'issues': cls.get_report()},
+                          report_file, indent=2)
+        logging.info("Report of issues written to %s", filename)
+
+    @staticmethod
+    def _get_osm_url(osm_type, osm_id):
+        return "https://osm.org/%s/%s" % (osm_type, osm_id)
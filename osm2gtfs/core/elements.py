@@ -2,6 +2,7 @@
 
 import logging
 import attr
+from osm2gtfs.core.diagnostics import Diagnostics
 
 
 @attr.s
@@ -197,8 +198,7 @@ class Stop(Element):
         if self._parent_station is None or override is True:
             self._parent_station = identifier
         else:
-            logging.warning("Stop is part of two stop areas: https://osm.org/%s/%s",
-                            self.osm_type, self.osm_id)
+            Diagnostics.add(Diagnostics.STOP_IN_TWO_STOP_AREAS, self.osm_type, self.osm_id)
 
     def get_parent_station(self):
         return self._parent_station
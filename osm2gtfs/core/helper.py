@@ -1,8 +1,11 @@
 # coding=utf-8
 
+import re
 import logging
 from math import cos, sin, atan2, sqrt, radians, degrees
 
+TIME_REGEX = re.compile(r'^(\d{1,3}):([0-5]?\d)(?::([0-5]\d))?$')
+
 
 class Helper(object):
     """The Helper class contains useful static functions
@@ -53,6 +56,22 @@ class Helper(object):
 
         return center_lat, center_lon
 
+    @staticmethod
+    def get_seconds_since_midnight(time):
+        """Helper function to parse a time of a schedule
+
+        Accepts times formatted as "HH:MM" or "HH:MM:SS". Hours may be more
+        than 23 for times after midnight of the following day.
+
+        :return seconds: Integer of seconds since midnight
+
+        """
+        match = TIME_REGEX.match(time)
+        if not match:
+            raise ValueError('Time "%s" is not formatted as HH:MM' % time)
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds or 0)
+
     @staticmethod
     def interpolate_stop_times(trip):
         """
@@ -92,6 +111,83 @@ class Helper(object):
 
         return d * 1000  # meters
 
+    @staticmethod
+    def simplify_shape(shape, tolerance, anchors=None):
+        """
+        Simplifies a shape with the Douglas-Peucker algorithm
+        (https://en.wikipedia.org/wiki/Ramer%E2%80%93Douglas%E2%80%93Peucker_algorithm)
+
+        Points are projected on a local plane around the first point of the
+        shape, which is accurate enough for the extent of a transit route.
+
+        :param shape: List of dictionaries with "lat" and "lon" keys
+        :param tolerance: Maximal deviation from the original shape in meters
+        :param anchors: List of (lat, lon) tuples, like stop positions. The
+            closest shape point to each of them is never removed.
+
+        :return shape: List of the remaining points of the shape
+        """
+        if len(shape) < 3 or tolerance <= 0:
+            return shape
+
+        radius = 6371000  # meters
+        scale = cos(radians(float(shape[0]["lat"])))
+
+        def project(lat, lon):
+            return (radians(float(lon)) * scale * radius,
+                    radians(float(lat)) * radius)
+
+        points = [project(point["lat"], point["lon"]) for point in shape]
+
+        keep = [False] * len(points)
+        keep[0] = keep[-1] = True
+
+        # Keep the shape points closest to the anchors
+        for lat, lon in anchors or []:
+            x, y = project(lat, lon)
+            distances = [(px - x) ** 2 + (py - y) ** 2 for px, py in points]
+            keep[distances.index(min(distances))] = True
+
+        # Simplify each section between two kept points separately
+        kept = [i for i, is_kept in enumerate(keep) if is_kept]
+        sections = list(zip(kept[:-1], kept[1:]))
+        while sections:
+            first, last = sections.pop()
+            if last - first < 2:
+                continue
+
+            max_distance = -1
+            max_index = first
+            for i in range(first + 1, last):
+                distance = Helper._get_distance_to_segment(
+                    points[i], points[first], points[last])
+                if distance > max_distance:
+                    max_distance = distance
+                    max_index = i
+
+            if max_distance > tolerance:
+                keep[max_index] = True
+                sections.append((first, max_index))
+                sections.append((max_index, last))
+
+        return [point for point, is_kept in zip(shape, keep) if is_kept]
+
+    @staticmethod
+    def _get_distance_to_segment(point, start, end):
+        """
+        Returns the distance of a projected point to the segment between the
+        projected points start and end.
+        """
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        if dx == 0 and dy == 0:
+            return sqrt((point[0] - start[0]) ** 2 + (point[1] - start[1]) ** 2)
+
+        # Position of the orthogonal projection on the segment
+        t = ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / (dx * dx + dy * dy)
+        t = max(0.0, min(1.0, t))
+        return sqrt((point[0] - start[0] - t * dx) ** 2 + (point[1] - start[1] - t * dy) ** 2)
+
     @staticmethod
     def calculate_color_of_contrast(color):
         """
@@ -0,0 +1,245 @@
+# coding=utf-8
+
+import time
+import zlib
+import socket
+import httplib
+import logging
+import threading
+from urlparse import urlparse, urljoin
+
+
+class HttpResponse(object):
+    """The HttpResponse class holds the status, headers (with lower case
+    names) and the decompressed body of a response
+
+    """
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class TokenBucket(object):
+    """The TokenBucket class limits the rate of requests
+
+    Tokens are refilled with a constant rate up to the capacity of the
+    bucket, which allows short bursts of requests.
+
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        :param rate: Amount of tokens added per second
+        :param capacity: Maximal amount of tokens in the bucket
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token from the bucket, waiting for it if necessary
+
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(self.capacity,
+                                   self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient(object):
+    """The HttpClient class is the shared transport layer for all downloads
+
+    It keeps connections alive and reuses them for following requests to the
+    same host, requests gzip compressed responses, limits the rate of requests
+    and retries requests with an exponential backoff, when servers are busy.
+    It is safe to be used by several threads.
+
+    """
+
+    # Status codes of responses, which are worth to retry later
+    RETRY_STATUS = (429, 504)
+
+    # Status codes of redirects, which are followed up to MAX_REDIRECTS times
+    REDIRECT_STATUS = (301, 302, 303, 307, 308)
+    MAX_REDIRECTS = 10
+
+    # Default timeout of Overpass queries on the server and the additional
+    # time waited for responses, in seconds
+    OVERPASS_TIMEOUT = 180
+    TIMEOUT_MARGIN = 60
+
+    def __init__(self, rate=None, burst=1, max_retries=3, backoff=1.0, timeout=300):
+        """
+        :param rate: Maximal amount of requests per second, or None
+        :param burst: Amount of requests allowed at once, before the rate
+            limit applies
+        :param max_retries: Maximal amount of retries of a request
+        :param backoff: Seconds to wait before the first retry; doubled for
+            each further retry
+        :param timeout: Timeout of connections in seconds
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._bucket = TokenBucket(rate, burst) if rate else None
+
+        # Idle connections by scheme and host
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, query_config):
+        """Creates a client with the settings of the "query" section of the
+        config file
+
+        The timeout of connections is the one of the Overpass queries with a
+        margin, so the server times out first.
+
+        :param query_config: Dictionary of the "query" section
+        :return client: HttpClient object
+
+        """
+        tiles_config = query_config.get('tiles') or {}
+        server_timeout = tiles_config.get('timeout', cls.OVERPASS_TIMEOUT)
+        return cls(rate=query_config.get('rate_limit'),
+                   max_retries=query_config.get('max_retries', 3),
+                   timeout=server_timeout + cls.TIMEOUT_MARGIN)
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def post(self, url, body, headers=None):
+        return self.request("POST", url, body, headers)
+
+    def request(self, method, url, body=None, headers=None):
+        """Sends a request and returns the response
+
+        Redirects are followed, requests redirected by "303 See Other" are
+        continued with GET. Responses with a status of RETRY_STATUS are
+        returned after all retries failed, redirects after MAX_REDIRECTS.
+
+        :return response: HttpResponse object
+
+        """
+        redirects = 0
+        while True:
+            response = self._request(method, url, body, headers)
+            location = response.headers.get("location")
+            if response.status not in self.REDIRECT_STATUS or not location:
+                return response
+            if redirects >= self.MAX_REDIRECTS:
+                logging.warning("Too many redirects for %s", url)
+                return response
+
+            url = urljoin(url, location)
+            if response.status == 303:
+                method, body = "GET", None
+            redirects += 1
+
+    def _request(self, method, url, body, headers):
+        """Helper function to send a request with retries
+
+        """
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ("http", "https") or not parsed_url.netloc:
+            raise ValueError("Unsupported URL: " + str(url))
+        path = parsed_url.path or "/"
+        if parsed_url.query:
+            path += "?" + parsed_url.query
+
+        request_headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        request_headers.update(headers or {})
+
+        attempt = 0
+        while True:
+            if self._bucket:
+                self._bucket.acquire()
+            response = self._send(parsed_url, method, path, body, request_headers)
+            if response.status not in self.RETRY_STATUS or attempt >= self.max_retries:
+                return response
+
+            delay = self.backoff * 2 ** attempt
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            logging.warning("Request to %s failed with status %s, retry in %s seconds",
+                            parsed_url.netloc, response.status, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, parsed_url, method, path, body, headers):
+        """Helper function to send a request over a pooled connection
+
+        """
+        key = (parsed_url.scheme, parsed_url.netloc)
+        connection, reused = self._get_connection(key)
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+        except socket.timeout:
+            connection.close()
+            raise
+        except (httplib.HTTPException, socket.error):
+            # The server might have closed the idle connection before it got
+            # the request, try a new one. Requests on new connections and the
+            # ones, which timed out, are not sent again.
+            connection.close()
+            if not reused:
+                raise
+            connection = self._create_connection(key)
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+        data = response.read()
+
+        response_headers = dict((name.lower(), value) for name, value in response.getheaders())
+        if response_headers.get("content-encoding") == "gzip":
+            data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                self._connections.setdefault(key, []).append(connection)
+
+        return HttpResponse(response.status, response_headers, data)
+
+    def _get_connection(self, key):
+        """Helper function to take an idle connection from the pool or to
+        create a new one
+
+        :return connection: Tuple of the connection and whether it was taken
+            from the pool
+
+        """
+        with self._lock:
+            connections = self._connections.get(key)
+            if connections:
+                return connections.pop(), True
+        return self._create_connection(key), False
+
+    def _create_connection(self, key):
+        scheme, netloc = key
+        if scheme == "https":
+            return httplib.HTTPSConnection(netloc, timeout=self.timeout)
+        return httplib.HTTPConnection(netloc, timeout=self.timeout)
+
+    def close(self):
+        """Closes all idle connections
+
+        """
+        with self._lock:
+            for connections in self._connections.values():
+                for connection in connections:
+                    connection.close()
+            self._connections.clear()
@@ -2,13 +2,19 @@
 
 import logging
 import sys
-from collections import OrderedDict
+import socket
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
+from datetime import datetime, timedelta
 import overpy
 import webcolors
 from transitfeed import util
 from osm2gtfs.core.cache import Cache
+from osm2gtfs.core.diagnostics import Diagnostics
+from osm2gtfs.core.http_client import HttpClient
 from osm2gtfs.core.helper import Helper
 from osm2gtfs.core.elements import Line, Itinerary, Station, Stop
+from osm2gtfs.core.stop_context import StopContext
 
 
 class OsmConnector(object):
@@ -40,6 +46,19 @@ class OsmConnector(object):
                      str(self.config['query']['bbox']["n"]) + "," +
                      str(self.config['query']['bbox']["e"]))
 
+        # Settings of queries and splitting of the bbox into tiles
+        self.query_settings = "[out:json]"
+        self.tiles = self.config['query'].get('tiles')
+        if self.tiles:
+            if 'timeout' in self.tiles:
+                self.query_settings += "[timeout:%d]" % self.tiles['timeout']
+            if 'maxsize' in self.tiles:
+                self.query_settings += "[maxsize:%d]" % self.tiles['maxsize']
+
+        # Endpoint of the Overpass API and rate of requests to it
+        self.overpass_url = self.config['query'].get('endpoint', overpy.Overpass.default_url)
+        self.http_client = HttpClient.from_config(self.config['query'])
+
         # tags from config file for querying
         self.tags = ''
         for key, value in self.config["query"].get("tags", {}).iteritems():
@@ -65,6 +84,11 @@ class OsmConnector(object):
             if self.config['stops']['name_auto'] == "yes":
                 self.auto_stop_names = True
 
+        # Maximal gap (in meters) between two ways to be bridged in shapes
+        self.shape_max_gap = 0
+        if 'shapes' in self.config and 'max_gap' in self.config['shapes']:
+            self.shape_max_gap = float(self.config['shapes']['max_gap'])
+
         # Selector
         if 'selector' in self.config:
             self.selector = self.config['selector']
@@ -75,6 +99,17 @@ class OsmConnector(object):
         self.routes = {}
         self.stops = {}
 
+        # Resolved stops shared by all creators, built once
+        self._stop_context = None
+
+        # Versions of route relations and ways of itineraries, used to
+        # refresh only changed routes
+        self._routes_meta = {'timestamp': None, 'relations': {}, 'ways': {}}
+
+        # Geography of ways used for the generation of shapes
+        self._way_nodes = {}
+        self._node_geography = {}
+
     def __repr__(self):
         rep = ""
         if self.config is not None:
@@ -116,9 +151,128 @@ class OsmConnector(object):
 
         # No cached data was found or refresh was forced
         logging.info("Query and build fresh data for routes")
+        refresh_time = datetime.utcnow()
 
         # Obtain raw data about routes from OpenStreetMap
-        result = self._query_routes()
+        result = self._query_by_tiles(self._query_routes)
+
+        return self._replace_routes(result, refresh_time)
+
+    def refresh_routes_and_stops(self):
+        """The refresh_routes_and_stops function refreshes the data of routes
+        and stops with one single query.
+
+        The raw data of routes and stops is obtained together and split up
+        again, before Line, Itinerary, Stop and Station objects are built.
+
+        :return routes: A dictionary of Line objects
+        :return stops: A dictionary of Stops and Stations
+
+        """
+        logging.info("Query and build fresh data for routes and stops")
+        refresh_time = datetime.utcnow()
+
+        # Obtain raw data about routes and stops from OpenStreetMap
+        routes_result, stops_result = self._split_routes_and_stops(
+            self._query_by_tiles(self._query_routes_and_stops))
+
+        return (self._replace_routes(routes_result, refresh_time),
+                self._replace_stops(stops_result))
+
+    def _replace_routes(self, result, refresh_time):
+        """Helper function to build all routes from scratch and cache them
+
+        """
+        self.routes = {}
+        self._routes_meta = {'timestamp': refresh_time, 'relations': {}, 'ways': {}}
+        self._build_routes(result)
+
+        # Cache data
+        Cache.write_data(self.selector + '-routes', self.routes)
+        Cache.write_data(self.selector + '-routes-meta', self._routes_meta)
+
+        return self.routes
+
+    def refresh_changed_routes(self):
+        """The refresh_changed_routes function refreshes only the data of
+        routes, which changed in OpenStreetMap since the last refresh.
+
+        A cheap query obtains the versions of all route variants and masters
+        and the ways of routes, which changed since the last refresh (or which
+        nodes did). Only Line objects related to changed relations or ways are
+        queried and built again. All others are taken from the cache.
+
+        :return routes: A dictionary of Line objects with related
+            Itinerary objects constituting the tree of data.
+
+        """
+        routes = Cache.read_data(self.selector + '-routes')
+        meta = Cache.read_data(self.selector + '-routes-meta')
+        if not routes or not meta:
+            logging.info("No cached routes found to compare with")
+            return self.get_routes(refresh=True)
+
+        logging.info("Query changes of routes since last refresh")
+        refresh_time = datetime.utcnow()
+
+        # The Overpass API might lag behind; consider changes since then, too
+        since = meta['timestamp'] - timedelta(hours=1)
+        probe = self._query_by_tiles(lambda bbox: self._query_route_changes(since, bbox))
+
+        relations = {}
+        for relation in probe.relations:
+            relations[relation.id] = relation
+
+        # Find new, changed and deleted relations
+        changed = set(meta['relations']) - set(relations)
+        for relation in relations.values():
+            if meta['relations'].get(relation.id) != self._get_version(relation):
+                changed.add(relation.id)
+
+        # Find route variants with changed ways
+        changed_ways = set(way.id for way in probe.ways)
+        for rvid, ways in meta['ways'].iteritems():
+            if changed_ways.intersection(ways):
+                changed.add(rvid)
+
+        # Find all relations and cached lines depending on the changes
+        rebuild, outdated_lines = self._get_routes_to_rebuild(changed, relations, routes)
+
+        for key in outdated_lines:
+            del routes[key]
+        for relation_id in rebuild:
+            meta['relations'].pop(relation_id, None)
+            meta['ways'].pop(relation_id, None)
+
+        self.routes = routes
+        self._routes_meta = meta
+
+        # Query and build changed routes again
+        rebuild = [relation_id for relation_id in rebuild if relation_id in relations]
+        if rebuild:
+            self._build_routes(self._query_routes_by_ids(rebuild))
+
+        logging.info("Replaced %s outdated lines by rebuilding %s relations",
+                     len(outdated_lines), len(rebuild))
+
+        # Cache data
+        meta['timestamp'] = refresh_time
+        Cache.write_data(self.selector + '-routes', self.routes)
+        Cache.write_data(self.selector + '-routes-meta', self._routes_meta)
+
+        return self.routes
+
+    def _build_routes(self, result):
+        """Helper function to build Line and Itinerary objects from a query
+        result and to add them to the routes
+
+        """
+        self._way_nodes = {}
+        self._node_geography = {}
+
+        # Keep versions of relations to detect changes later
+        for relation in result.relations:
+            self._routes_meta['relations'][relation.id] = self._get_version(relation)
 
         # Pre-sort relations by type
         route_masters = {}
@@ -203,10 +357,52 @@ class OsmConnector(object):
                     if line is not None:
                         self.routes[line.route_id] = line
 
-        # Cache data
-        Cache.write_data(self.selector + '-routes', self.routes)
+    @staticmethod
+    def _get_routes_to_rebuild(changed, relations, routes):
+        """Helper function to find all relations, which need to be rebuilt due
+        to changed relations. Route masters and their variants always get built
+        together.
 
-        return self.routes
+        :return rebuild: Set of relation ids to be queried and built again
+        :return outdated_lines: Set of keys of Line objects in routes, which
+            are outdated
+
+        """
+        # Index current route masters and cached lines by relation ids
+        masters = {}
+        for relation in relations.values():
+            if relation.tags.get("type") == "route_master":
+                for member in relation.members:
+                    masters.setdefault(member.ref, set()).add(relation.id)
+        lines = {}
+        for key, line in routes.iteritems():
+            lines.setdefault(line.osm_id, set()).add(key)
+            for itinerary in line.get_itineraries():
+                lines.setdefault(itinerary.osm_id, set()).add(key)
+
+        rebuild = set()
+        outdated_lines = set()
+        pending = list(changed)
+        while pending:
+            relation_id = pending.pop()
+            if relation_id in rebuild:
+                continue
+            rebuild.add(relation_id)
+
+            related = set(masters.get(relation_id, []))
+            if relation_id in relations and \
+                    relations[relation_id].tags.get("type") == "route_master":
+                related.update(member.ref for member in relations[relation_id].members
+                               if member.ref in relations)
+            for key in lines.get(relation_id, []):
+                if key not in outdated_lines:
+                    outdated_lines.add(key)
+                    related.add(routes[key].osm_id)
+                    related.update(itinerary.osm_id
+                                   for itinerary in routes[key].get_itineraries())
+            pending.extend(related - rebuild)
+
+        return rebuild, outdated_lines
 
     def set_stops(self, stops):
         self.stops = stops
@@ -253,10 +449,33 @@ class OsmConnector(object):
         # No cached data was found or refresh was forced
         logging.info("Query and build fresh data for stops")
 
-        # Obtain raw data about routes from OpenStreetMap
-        result = self._query_stops()
+        # Obtain raw data about stops from OpenStreetMap
+        result = self._query_by_tiles(self._query_stops)
+
+        return self._replace_stops(result)
+
+    def get_stop_context(self):
+        """The get_stop_context function returns the stops resolved for the
+        creators.
+
+        The StopContext is built only once from the stops (including guessed
+        names of unnamed stops) and shared by all creators.
+
+        :return stop_context: StopContext object
+
+        """
+        if self._stop_context is None:
+            self._stop_context = StopContext(self.get_stops())
+        return self._stop_context
+
+    def _replace_stops(self, result):
+        """Helper function to build all stops from scratch and cache them
+
+        """
+        self.stops = {}
         self.stops['regular'] = {}
         self.stops['stations'] = {}
+        self._stop_context = None
 
         # Build stops from ways (polygons)
         for stop in result.ways:
@@ -311,19 +530,13 @@ class OsmConnector(object):
         if 'ref' in route_master.tags:
             ref = route_master.tags['ref']
         else:
-            logging.warning(
-                "Relation without 'ref'. Please fix in OpenStreetMap")
-            logging.warning(
-                " https://osm.org/relation/%s", route_master.id)
+            Diagnostics.add(Diagnostics.MISSING_REF, "relation", route_master.id)
 
             # Check if a ref can be taken from one of the itineraries
             ref = False
             for itinerary in list(itineraries.values()):
                 if not ref and itinerary.route_id:
                     ref = itinerary.route_id
-                    logging.warning(
-                        "Using 'ref' from member variant instead")
-                    logging.warning("%s", itinerary.osm_url)
 
             if not ref:
                 ref = ""
@@ -381,8 +594,7 @@ class OsmConnector(object):
         if 'ref' in route_variant.tags:
             ref = route_variant.tags['ref']
         else:
-            logging.warning(
-                "RouteVariant without 'ref': %s", route_variant.id)
+            Diagnostics.add(Diagnostics.MISSING_REF, "relation", route_variant.id)
             ref = ""
 
         stops = []
@@ -421,6 +633,9 @@ class OsmConnector(object):
 
         shape = self._generate_shape(route_variant, query_result_set)
 
+        # Keep ways of the itinerary to detect changes later
+        self._routes_meta['ways'][route_variant.id] = self._get_route_ways(route_variant)
+
         rv = Itinerary(osm_id=route_variant.id, osm_type=osm_type,
                        osm_url=osm_url, name=name, tags=route_variant.tags,
                        route_id=ref, shape=shape, line=parent_identifier,
@@ -442,8 +657,11 @@ class OsmConnector(object):
 
             # Ways don't have a pair of coordinates and need to be calculated
             if osm_type == "way":
-                (stop.lat, stop.lon) = Helper.get_center_of_nodes(
-                    stop.get_nodes())
+                if stop.center_lat is not None:
+                    (stop.lat, stop.lon) = (stop.center_lat, stop.center_lon)
+                else:
+                    (stop.lat, stop.lon) = Helper.get_center_of_nodes(
+                        self._get_way_geometry(stop))
 
             # Move to Elements class, once attributes with defaults play well
             # with inheritance https://github.com/python-attrs/attrs/issues/38
@@ -554,125 +772,481 @@ class OsmConnector(object):
                           lon=stop_area.lon)
         station.set_members(members)
 
-        logging.info("Stop area (OSM) has been used to create a station (GTFS):\n")
-        logging.info(" https://osm.org/relation/%s\n", str(stop_area.id))
-
         return station
 
-    def _query_routes(self):
+    def _query_by_tiles(self, query_function):
+        """Helper function to run a query for the bbox of the configuration
+
+        Without "tiles" in the "query" section of the config file, the whole
+        bbox is queried at once. Otherwise it gets split into tiles, which
+        are queried in parallel. Tiles which time out or exceed the maximal
+        size of results are split up again (like a quadtree), up to the
+        configured maximal depth. The results of all tiles are merged.
+
+        :param query_function: Function querying a bbox given as string
+
+        :return result: Merged overpy.Result
+
+        """
+        if not self.tiles:
+            return query_function(self.bbox)
+
+        bbox = self.config['query']['bbox']
+        tiles = [(float(bbox["s"]), float(bbox["w"]), float(bbox["n"]), float(bbox["e"]))]
+        for _ in range(self.tiles.get('depth', 1)):
+            tiles = [quarter for tile in tiles for quarter in self._split_tile(tile)]
+
+        max_depth = self.tiles.get('max_depth', 4)
+        pool = ThreadPool(self.tiles.get('workers', 4))
+        result = None
+        try:
+            depth = self.tiles.get('depth', 1)
+            while tiles:
+                logging.info("Query %s tiles of depth %s", len(tiles), depth)
+                failed_tiles = []
+                for tile, tile_result in pool.map(
+                        lambda tile: self._query_tile(query_function, tile), tiles):
+                    if isinstance(tile_result, overpy.Result):
+                        if result is None:
+                            result = tile_result
+                        else:
+                            result.expand(tile_result)
+                    elif depth < max_depth:
+                        failed_tiles.append(tile)
+                    else:
+                        raise tile_result
+
+                depth += 1
+                tiles = [quarter for tile in failed_tiles for quarter in self._split_tile(tile)]
+        finally:
+            pool.close()
+        return result
+
+    @staticmethod
+    def _query_tile(query_function, tile):
+        """Helper function to query a tile
+
+        :return tile: The queried tile
+        :return result: overpy.Result or the exception, if the tile is too
+            large to be queried
+
+        """
+        try:
+            return tile, query_function("%s,%s,%s,%s" % tile)
+        except (overpy.exception.OverpassGatewayTimeout,
+                overpy.exception.OverpassRuntimeError,
+                socket.timeout) as e:
+            logging.info("Tile %s is too large to be queried: %s", tile, e)
+            return tile, e
+
+    @staticmethod
+    def _split_tile(tile):
+        """Helper function to split a tile (south, west, north, east) into
+        four quarters
+
+        """
+        south, west, north, east = tile
+        lat = (south + north) / 2
+        lon = (west + east) / 2
+        return [(south, west, lat, lon), (south, lon, lat, east),
+                (lat, west, north, lon), (lat, lon, north, east)]
+
+    def _query(self, query_str):
+        """Helper function to send a query to the Overpass API
+
+        :return result: overpy.Result
+
+        """
+        logging.info(query_str)
+        response = self.http_client.post(self.overpass_url, query_str.encode("utf-8"))
+
+        api = overpy.Overpass()
+        if response.status == 200:
+            content_type = response.headers.get("content-type", "")
+            if content_type.startswith("application/json"):
+                return api.parse_json(response.body)
+            if content_type.startswith("application/osm3s+xml"):
+                return api.parse_xml(response.body)
+            raise overpy.exception.OverpassUnknownContentType(content_type)
+        elif response.status == 400:
+            raise overpy.exception.OverpassBadRequest(query_str, msgs=[response.body])
+        elif response.status == 429:
+            raise overpy.exception.OverpassTooManyRequests()
+        elif response.status == 504:
+            raise overpy.exception.OverpassGatewayTimeout()
+        raise overpy.exception.OverpassUnknownHTTPStatusCode(response.status)
+
+    def _query_routes(self, bbox):
         """Helper function to query OpenStreetMap routes
 
         Returns raw data on routes from OpenStreetMap
 
         """
         # Query relations of route variants, their masters and geometry
-        api = overpy.Overpass()
-        query_str = """(
+        query_str = """%s;
+            (
             /* Obtain route variants based on tags and bounding box */
             relation%s(%s)->.routes;
 
             /*  Query for related route masters */
             relation[type=route_master](br.routes)->.masters;
 
-            /* Query for routes' geometry (ways and it's nodes) */
-            way(r.routes);
-            node(w);
+            /* Query for routes' ways */
+            way(r.routes)->.ways;
+            );
 
-            /* Select all result sets  */
-            ( .routes;.masters;._; );
+            /* Return tags, versions and members of relations */
+            ( .routes;.masters; );
+            out meta;
 
-            /* Return tags for elements and roles for relation members. */
-            );out body;""" % (self.tags, self.bbox)
-        logging.info(query_str)
-        return api.query(query_str)
+            /* Return tags and nodes of ways with their geometry inline */
+            .ways out geom;""" % (self.query_settings, self.tags, bbox)
+        return self._query(query_str)
+
+    def _query_route_changes(self, since, bbox):
+        """Helper function to query changes of OpenStreetMap routes
+
+        Returns raw data on route variants and masters with their versions and
+        the ids of ways of routes, which changed since the given time
+
+        """
+        since = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+        query_str = """%s;
+            (
+            /* Obtain route variants based on tags and bounding box */
+            relation%s(%s)->.routes;
+
+            /*  Query for related route masters */
+            relation[type=route_master](br.routes)->.masters;
+
+            /* Query for ways of routes and their changed nodes */
+            way(r.routes)->.ways;
+            node(w.ways)(changed:"%s")->.nodes;
+            );
+
+            /* Return tags, versions and members of relations */
+            ( .routes;.masters; );
+            out meta;
+
+            /* Return ids of changed ways and ways with changed nodes */
+            ( way.ways(changed:"%s"); way.ways(bn.nodes); );
+            out ids;""" % (self.query_settings, self.tags, bbox, since, since)
+        return self._query(query_str)
+
+    def _query_routes_by_ids(self, relation_ids):
+        """Helper function to query OpenStreetMap routes by their ids
+
+        Returns raw data on the given route variants and masters
+
+        """
+        query_str = """%s;
+            (
+            /* Obtain route variants and masters by their ids */
+            relation(id:%s)->.routes;
+
+            /* Query for routes' ways */
+            way(r.routes)->.ways;
+            );
+
+            /* Return tags, versions and members of relations */
+            .routes;
+            out meta;
+
+            /* Return tags and nodes of ways with their geometry inline */
+            .ways out geom;""" % (self.query_settings,
+                                  ",".join(str(relation_id) for relation_id in relation_ids))
+        return self._query(query_str)
+
+    @staticmethod
+    def _split_routes_and_stops(result):
+        """Helper function to split the result of a combined query into the
+        raw data of routes and of stops, as returned by the single queries
+
+        Platforms are identified by their role in route variants, stop areas
+        by their tags.
 
-    def _query_stops(self):
+        :return routes_result: Result with route variants, masters and ways
+        :return stops_result: Result with platforms and stop areas
+
+        """
+        routes = []
+        stop_areas = []
+        for relation in result.relations:
+            if relation.tags.get("public_transport") == "stop_area":
+                stop_areas.append(relation)
+            else:
+                routes.append(relation)
+
+        platform_nodes = set()
+        platform_ways = set()
+        for relation in routes:
+            for member in relation.members:
+                if member.role == "platform":
+                    if isinstance(member, overpy.RelationNode):
+                        platform_nodes.add(member.ref)
+                    elif isinstance(member, overpy.RelationWay):
+                        platform_ways.add(member.ref)
+
+        stop_ways = [way for way in result.ways if way.id in platform_ways]
+        for way in stop_ways:
+            # Ways without inline geometry need their nodes
+            if way.center_lat is None and not way.attributes.get("geometry"):
+                platform_nodes.update(node.id for node in way.get_nodes())
+        stop_nodes = [node for node in result.nodes if node.id in platform_nodes]
+
+        routes_result = overpy.Result(routes + result.ways + result.nodes, api=result.api)
+        stops_result = overpy.Result(stop_nodes + stop_ways + stop_areas, api=result.api)
+        return routes_result, stops_result
+
+    def _query_routes_and_stops(self, bbox):
+        """Helper function to query OpenStreetMap routes and stops together
+
+        Returns raw data on routes and stops from OpenStreetMap
+
+        """
+        query_str = """%s;
+            (
+            /* Obtain route variants based on tags and bounding box */
+            relation%s(%s)->.routes;
+
+            /*  Query for related route masters */
+            relation[type=route_master](br.routes)->.masters;
+
+            /* Query for routes' ways */
+            way(r.routes)->.ways;
+
+            /*  Query for relation elements with role platform */
+            node(r.routes:"platform")->.platforms;
+            way(r.routes:"platform")->.platform_ways;
+            );
+
+            /* Return tags, versions and members of relations */
+            ( .routes;.masters; );
+            out meta;
+
+            /* Return ways with their geometry inline, platforms by center */
+            ( .ways; - .platform_ways; );
+            out geom;
+            .platform_ways out center;
+            .platforms out body;
+
+            /* Select stop area relations of all platforms at once */
+            (
+            rel(bn.platforms:"platform")["public_transport"="stop_area"];
+            rel(bw.platform_ways:"platform")["public_transport"="stop_area"];
+            );
+            out body;""" % (self.query_settings, self.tags, bbox)
+        return self._query(query_str)
+
+    def _query_stops(self, bbox):
         """Helper function to query OpenStreetMap stops
 
         Returns raw data on stops from OpenStreetMap
 
         """
         # Query stops with platform role from selected relations
-        api = overpy.Overpass()
-        query_str = """(
+        query_str = """%s;
+            (
             /* Obtain route variants based on tags and bounding box */
             relation%s(%s);
 
             /*  Query for relation elements with role platform */
             node(r:"platform")->.nodes;
-            way(r:"platform");
-            node(w);
-
-            /* Select all result sets  */
-            ( .nodes;._; );
+            way(r:"platform")->.ways;
+            );
 
-            /* Return tags for elements */
-            );out body;
+            /* Return tags for elements, ways by their center */
+            .nodes out body;
+            .ways out center;
 
-            /* Select stop area relations */
-            foreach.nodes(
-            rel(bn:"platform")["public_transport"="stop_area"];
-            out body;
-            );""" % (self.tags, self.bbox)
-        logging.info(query_str)
-        return api.query(query_str)
+            /* Select stop area relations of all platforms at once */
+            (
+            rel(bn.nodes:"platform")["public_transport"="stop_area"];
+            rel(bw.ways:"platform")["public_transport"="stop_area"];
+            );
+            out body;""" % (self.query_settings, self.tags, bbox)
+        return self._query(query_str)
 
     def _generate_shape(self, route_variant, query_result_set):
         """Helper function to generate a valid GTFS shape from OSM query result
         data
 
+        The ways of the route variant are chained together by their end nodes.
+        They are taken in the order of the relation members, whenever
+        possible. Members out of order and roundabouts are handled, too. Gaps
+        between ways are bridged, when they are smaller than the "max_gap" (in
+        meters) of the "shapes" section in the config file.
+
         Returns list of coordinates representing a shape
 
         """
-        shape = []
+        ways = self._get_route_ways(route_variant)
+
+        # Obtain geography (nodes) of ways and index them by their end nodes
+        way_ids = []
+        way_nodes = []
+        endpoints = {}
+        for way in ways:
+            nodes = self._get_way_nodes(way, query_result_set)
+            if len(nodes) < 2:
+                logging.warning("Route has a way without geometry: https://osm.org/relation/%s",
+                                route_variant.id)
+                logging.warning("  Problem at: https://osm.org/way/%s", way)
+                continue
+            endpoints.setdefault(nodes[0], []).append(len(way_nodes))
+            endpoints.setdefault(nodes[-1], []).append(len(way_nodes))
+            way_ids.append(way)
+            way_nodes.append(nodes)
+
+        chain = WayChain()
+        used = [False] * len(way_nodes)
+        position = 0
+        while True:
+            # Skip ways, which were already chained out of order
+            while position < len(way_nodes) and used[position]:
+                position += 1
+            if position == len(way_nodes):
+                break
+
+            # Preferably use the next way in order of the relation members
+            if chain.add(way_nodes[position]):
+                used[position] = True
+                continue
+
+            way = self._find_connecting_way(chain, way_nodes, used, endpoints)
+            if way is not None:
+                chain.add(way_nodes[way])
+            else:
+                way = self._find_closest_way(chain, position, way_nodes, used)
+                if way is None:
+                    Diagnostics.add(Diagnostics.NON_MATCHING_WAYS, "relation",
+                                    route_variant.id, way_ids[position])
+                    break
+                chain.bridge(way_nodes[way], self._get_distance(
+                    chain.last(), way_nodes[way][-1]) < self._get_distance(
+                        chain.last(), way_nodes[way][0]))
+            used[way] = True
 
+        return [self._node_geography[node] for node in chain.get_nodes()]
+
+    @staticmethod
+    def _get_route_ways(route_variant):
+        """Helper function to obtain the ids of the ways of a route variant,
+        which are forming its geometry
+
+        :return ways: List of way ids
+
+        """
         ways = []
         for member in route_variant.members:
             if isinstance(member, overpy.RelationWay):
                 if not str(member.role).startswith("platform"):
                     ways.append(member.ref)
+        return ways
 
-        shape_sorter = []
-        node_geography = {}
+    @staticmethod
+    def _get_version(element):
+        """Helper function to obtain the version and timestamp of an OSM
+        element, as far as provided by the query result
 
-        for way in ways:
-            # Obtain geography (nodes) from original query result set
-            nodes = query_result_set.get_ways(way).pop().get_nodes()
-
-            # Prepare data for sorting and geographic information of nodes
-            way_nodes = []
-            for node in nodes:
-                way_nodes.append(node.id)
-                node_geography[node.id] = {'lat': float(
-                    node.lat), 'lon': float(node.lon)}
-
-            if len(shape_sorter) == 0:
-                shape_sorter.extend(way_nodes)
-            elif shape_sorter[-1] == way_nodes[0]:
-                del shape_sorter[-1]
-                shape_sorter.extend(way_nodes)
-            elif shape_sorter[-1] == way_nodes[-1]:
-                del shape_sorter[-1]
-                shape_sorter.extend(reversed(way_nodes))
-            elif shape_sorter[0] == way_nodes[0]:
-                del shape_sorter[0]
-                shape_sorter.reverse()
-                shape_sorter.extend(way_nodes)
-            elif shape_sorter[0] == way_nodes[-1]:
-                del shape_sorter[0]
-                shape_sorter.reverse()
-                shape_sorter.extend(reversed(way_nodes))
-            else:
-                logging.warning("Route has non-matching ways: https://osm.org/relation/%s",
-                                route_variant.id)
-                logging.warning(
-                    "  Problem at: https://osm.org/way/%s", way)
-                break
+        :return version: Tuple of version and timestamp
+
+        """
+        attributes = element.attributes or {}
+        return attributes.get("version"), attributes.get("timestamp")
+
+    def _get_way_nodes(self, way_id, query_result_set):
+        """Helper function to obtain the ids of the nodes of a way
+
+        The geography of each node is kept for the generation of shapes. Ways
+        are only resolved once, as they are usually shared by several route
+        variants.
+
+        :return nodes: List of node ids
+
+        """
+        if way_id not in self._way_nodes:
+            ways = query_result_set.get_ways(way_id)
+            if not ways:
+                return []
+
+            nodes = []
+            for node in self._get_way_geometry(ways[0]):
+                nodes.append(node.id)
+                if node.id not in self._node_geography:
+                    self._node_geography[node.id] = {
+                        'lat': float(node.lat), 'lon': float(node.lon)}
+            self._way_nodes[way_id] = nodes
+        return self._way_nodes[way_id]
+
+    @staticmethod
+    def _get_way_geometry(way):
+        """Helper function to obtain the nodes of a way
+
+        Queries return the geometry of ways inline ("out geom"). Without it,
+        like in XML results, the nodes are taken from the result.
+
+        :return nodes: List of overpy.Node objects
+
+        """
+        geometry = way.attributes.get("geometry")
+        if not geometry:
+            try:
+                return way.get_nodes()
+            except overpy.exception.DataIncomplete:
+                return []
+
+        # pylint: disable=protected-access
+        return [overpy.Node(node_id=node_id, lat=point["lat"], lon=point["lon"], attributes={})
+                for node_id, point in zip(way._node_ids, geometry)]
+
+    @staticmethod
+    def _find_connecting_way(chain, way_nodes, used, endpoints):
+        """Helper function to find an unused way connecting to the chain
+
+        :return way: Index of a connecting way, or None
+
+        """
+        for node in chain.get_open_nodes():
+            for way in endpoints.get(node, []):
+                if not used[way] and chain.can_add(way_nodes[way]):
+                    return way
+        return None
+
+    def _find_closest_way(self, chain, position, way_nodes, used):
+        """Helper function to find the unused way, which is closest to the end
+        of the chain. Only ways within the maximal gap size are considered.
+
+        :return way: Index of the closest way, or None
+
+        """
+        if not self.shape_max_gap:
+            return None
+
+        def get_gap(way):
+            return min(self._get_distance(chain.last(), way_nodes[way][0]),
+                       self._get_distance(chain.last(), way_nodes[way][-1]))
 
-        for sorted_node in shape_sorter:
-            shape.append(node_geography[sorted_node])
+        # Preferably bridge the gap to the next way in order
+        if get_gap(position) <= self.shape_max_gap:
+            return position
 
-        return shape
+        closest = None
+        closest_gap = self.shape_max_gap
+        for way in range(position + 1, len(way_nodes)):
+            if not used[way] and get_gap(way) <= closest_gap:
+                closest = way
+                closest_gap = get_gap(way)
+        return closest
+
+    def _get_distance(self, from_node, to_node):
+        """Helper function to get the distance in meters between two nodes
+
+        """
+        from_point = self._node_geography[from_node]
+        to_point = self._node_geography[to_node]
+        return Helper.get_crow_fly_distance((from_point['lat'], from_point['lon']),
+                                            (to_point['lat'], to_point['lon']))
 
     def _is_valid_stop_candidate(self, stop):
         """Helper function to check if a stop candidate has a valid tagging
@@ -716,11 +1290,18 @@ class OsmConnector(object):
         """Define name for stop without explicit name based on sourroundings
 
         """
-        api = overpy.Overpass()
-
-        result = api.query("""
+        # The nodes of the ways are part of the result, so no further queries
+        # are needed to locate them. They are printed last and without tags,
+        # so named nodes keep their tags.
+        result = self._query("""
         <osm-script>
-          <query type="way">
+          <query type="node">
+            <around lat="%s" lon="%s" radius="50.0"/>
+            <has-kv k="name"/>
+            <has-kv modv="not" k="highway" v="bus_stop"/>
+          </query>
+          <print order="quadtile"/>
+          <query type="way" into="ways">
             <around lat="%s" lon="%s" radius="50.0"/>
             <has-kv k="name" />
             <has-kv modv="not" k="highway" v="trunk"/>
@@ -728,13 +1309,9 @@ class OsmConnector(object):
             <has-kv modv="not" k="highway" v="secondary"/>
             <has-kv modv="not" k="amenity" v="bus_station"/>
           </query>
-          <print order="quadtile"/>
-          <query type="node">
-            <around lat="%s" lon="%s" radius="50.0"/>
-            <has-kv k="name"/>
-            <has-kv modv="not" k="highway" v="bus_stop"/>
-          </query>
-          <print order="quadtile"/>
+          <print from="ways" order="quadtile"/>
+          <recurse from="ways" type="way-node"/>
+          <print mode="skeleton" order="quadtile"/>
         </osm-script>
         """ % (stop.lat, stop.lon, stop.lat, stop.lon))
 
@@ -762,8 +1339,7 @@ class OsmConnector(object):
         winner_distance = sys.maxint
         for candidate in candidates:
             if isinstance(candidate, overpy.Way):
-                lat, lon = Helper.get_center_of_nodes(
-                    candidate.get_nodes(resolve_missing=True))
+                lat, lon = Helper.get_center_of_nodes(candidate.get_nodes())
                 distance = util.ApproximateDistance(
                     lat,
                     lon,
@@ -783,3 +1359,147 @@ class OsmConnector(object):
 
         # take name from winner
         stop.name = winner.tags["name"]
+
+
+class WayChain(object):
+    """A chain of node ids of consecutive ways, forming the shape of a route
+
+    The chain can be extended and reversed in constant time (per added node).
+
+    """
+
+    def __init__(self):
+        self._nodes = deque()
+        self._reversed = False
+        self._ways_count = 0
+
+        # Positions of the nodes of a roundabout at the end of the chain
+        self._roundabout = None
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def first(self):
+        return self._nodes[-1] if self._reversed else self._nodes[0]
+
+    def last(self):
+        return self._nodes[0] if self._reversed else self._nodes[-1]
+
+    def get_nodes(self):
+        if self._reversed:
+            return list(reversed(self._nodes))
+        return list(self._nodes)
+
+    def get_open_nodes(self):
+        """Returns the nodes where other ways can be connected to the chain
+
+        The beginning of the chain is only open as long as it consists of one
+        way, which might be oriented in the opposite direction of the route.
+
+        """
+        if not self._nodes:
+            return []
+        nodes = [self.last()]
+        if self._ways_count == 1:
+            nodes.append(self.first())
+        if self._roundabout:
+            nodes.extend(self._roundabout.keys())
+        return nodes
+
+    def can_add(self, nodes):
+        """Checks whether a way (list of node ids) connects to the chain
+
+        """
+        if not self._nodes:
+            return True
+        if nodes[0] == nodes[-1] and self.last() in nodes:
+            return True
+        ends = (self.last(), self.first())
+        if nodes[0] in ends or nodes[-1] in ends:
+            return True
+        return bool(self._roundabout) and (
+            nodes[0] in self._roundabout or nodes[-1] in self._roundabout)
+
+    def add(self, nodes):
+        """Adds a way (list of node ids) to the chain, if it connects to one of
+        the ends of the chain or to a roundabout at the end of the chain.
+
+        :return bool: Whether the way was added or not
+
+        """
+        if not self._nodes:
+            self._append(nodes)
+        elif self.last() == nodes[0]:
+            self._pop_last()
+            self._append(nodes)
+        elif self.last() == nodes[-1]:
+            self._pop_last()
+            self._append(reversed(nodes))
+        elif nodes[0] == nodes[-1] and self.last() in nodes:
+            # Enter a roundabout (closed way) at the end of the chain
+            entry = nodes.index(self.last())
+            self._pop_last()
+            self._append(nodes[entry:] + nodes[1:entry + 1])
+        elif self._roundabout and nodes[0] in self._roundabout:
+            # Leave a roundabout at the node the way starts from
+            self._truncate(self._roundabout[nodes[0]])
+            return self.add(nodes)
+        elif self._roundabout and nodes[-1] in self._roundabout:
+            self._truncate(self._roundabout[nodes[-1]])
+            return self.add(nodes)
+        elif self.first() == nodes[0]:
+            self._pop_first()
+            self._reverse()
+            self._append(nodes)
+        elif self.first() == nodes[-1]:
+            self._pop_first()
+            self._reverse()
+            self._append(reversed(nodes))
+        else:
+            return False
+        self._ways_count += 1
+        return True
+
+    def bridge(self, nodes, reverse=False):
+        """Adds a way (list of node ids) to the end of the chain without
+        requiring a shared node.
+
+        """
+        self._append(reversed(nodes) if reverse else nodes)
+        self._ways_count += 1
+
+    def _append(self, nodes):
+        nodes = list(nodes)
+        start = len(self._nodes)
+        if self._reversed:
+            self._nodes.extendleft(nodes)
+        else:
+            self._nodes.extend(nodes)
+
+        # Remember the positions of a roundabout, to allow leaving it later
+        self._roundabout = None
+        if len(nodes) > 2 and nodes[0] == nodes[-1]:
+            self._roundabout = {}
+            for index, node in enumerate(nodes):
+                self._roundabout.setdefault(node, start + index + 1)
+
+    def _pop_last(self):
+        if self._reversed:
+            self._nodes.popleft()
+        else:
+            self._nodes.pop()
+
+    def _pop_first(self):
+        if self._reversed:
+            self._nodes.pop()
+        else:
+            self._nodes.popleft()
+
+    def _reverse(self):
+        self._reversed = not self._reversed
+        self._roundabout = None
+
+    def _truncate(self, length):
+        while len(self._nodes) > length:
+            self._pop_last()
+        self._roundabout = None
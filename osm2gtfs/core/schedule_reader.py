@@ -0,0 +1,155 @@
+# coding=utf-8
+
+import re
+import json
+import codecs
+
+
+class ScheduleReader(object):
+    """The ScheduleReader class reads schedule source files incrementally
+
+    The file is read in chunks, while it gets decoded. The trips below
+    "lines" of the standard schedule format are decoded one by one and can be
+    prepared (and compacted) right away, so the raw file is never held in
+    memory as a whole. All other values are decoded as a whole.
+
+    More information about the standard schedule format:
+    https://github.com/grote/osm2gtfs/wiki/Schedule
+
+    """
+
+    CHUNK_SIZE = 65536
+
+    WHITESPACE = u" \t\n\r"
+
+    # Rest of a buffer, which may still continue a number
+    NUMBER_CONTINUATION = re.compile(r"[0-9.eE+\-\s]*\Z")
+
+    def __init__(self, source_file, chunk_size=CHUNK_SIZE):
+        """
+        :param source_file: File object of a JSON file, opened in binary mode
+        :param chunk_size: Amount of bytes read at once
+        """
+        self._file = source_file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = u""
+        self._position = 0
+        self._end_of_file = False
+
+    def read(self, prepare_trip=None):
+        """Reads the schedule
+
+        :param prepare_trip: Optional function called with the route id and
+            each trip of the "lines"; its return value replaces the trip
+
+        :return schedule: The decoded schedule
+
+        """
+        if self._peek() != u"{":
+            return self._decode()
+
+        schedule = {}
+        self._expect(u"{")
+        while self._peek() != u"}":
+            if schedule:
+                self._expect(u",")
+            key = self._decode()
+            self._expect(u":")
+            if key == u"lines" and self._peek() == u"{":
+                schedule[key] = self._read_lines(prepare_trip)
+            else:
+                schedule[key] = self._decode()
+        self._expect(u"}")
+        return schedule
+
+    def _read_lines(self, prepare_trip):
+        """Helper function to read the lines, trip by trip
+
+        """
+        lines = {}
+        self._expect(u"{")
+        while self._peek() != u"}":
+            if lines:
+                self._expect(u",")
+            route_id = self._decode()
+            self._expect(u":")
+            if self._peek() != u"[":
+                lines[route_id] = self._decode()
+                continue
+
+            trips = []
+            self._expect(u"[")
+            while self._peek() != u"]":
+                if trips:
+                    self._expect(u",")
+                trip = self._decode()
+                if prepare_trip is not None:
+                    trip = prepare_trip(route_id, trip)
+                trips.append(trip)
+            self._expect(u"]")
+            lines[route_id] = trips
+        self._expect(u"}")
+        return lines
+
+    def _fill(self):
+        """Helper function to read more data into the buffer
+
+        The amount read grows with the amount buffered, so large values don't
+        need to be decoded again too often.
+
+        :return success: False, if the end of the file was reached
+
+        """
+        if self._end_of_file:
+            return False
+        self._buffer = self._buffer[self._position:]
+        self._position = 0
+        chunk = self._file.read(max(self._chunk_size, len(self._buffer)))
+        if not chunk:
+            self._end_of_file = True
+        self._buffer += self._text_decoder.decode(chunk, final=self._end_of_file)
+        return True
+
+    def _peek(self):
+        """Helper function to return the next character after whitespace
+
+        :return character: Next character or an empty string at the end of
+            the file
+
+        """
+        while True:
+            while (self._position < len(self._buffer) and
+                   self._buffer[self._position] in self.WHITESPACE):
+                self._position += 1
+            if self._position < len(self._buffer) or not self._fill():
+                break
+        return self._buffer[self._position:self._position + 1]
+
+    def _expect(self, character):
+        found = self._peek()
+        if found != character:
+            raise ValueError("Expected '%s' but found '%s' in schedule source" % (
+                character, found))
+        self._position += 1
+
+    def _decode(self):
+        """Helper function to decode the next JSON value
+
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                # The value might be incomplete
+                if self._fill():
+                    continue
+                raise
+            # Numbers at the end of the buffer might continue, like "12." of
+            # "12.5", which gets decoded as 12
+            if self.NUMBER_CONTINUATION.match(self._buffer, end) and self._fill():
+                continue
+            self._position = end
+            return value
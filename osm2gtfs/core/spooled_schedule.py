@@ -0,0 +1,83 @@
+# coding=utf-8
+
+import logging
+import transitfeed
+from osm2gtfs.core.stop_times_spool import StopTimesSpool
+
+
+class SpooledTrip(transitfeed.Trip):
+    """Trip of a SpooledSchedule
+
+    While the schedule is written, the stop times are taken from its spool
+    instead of being collected by each trip.
+
+    """
+
+    def _GenerateStopTimesTuples(self):
+        # pylint: disable=protected-access,invalid-name
+        if getattr(self._schedule, 'stop_times_spool', None) is not None:
+            return iter(())
+        return transitfeed.Trip._GenerateStopTimesTuples(self)
+
+
+class SpooledSchedule(transitfeed.Schedule):
+    """The SpooledSchedule class writes GTFS feeds with bounded memory
+
+    The stop times are kept in a database on the hard drive instead of in
+    memory. transitfeed prepares each file of the feed as a whole in memory
+    before it is added to the zip file. For the stop_times file this is done
+    through a StopTimesSpool instead, which spills the stop times to
+    temporary files once its buffer size is reached and merges them into
+    the zip file in the order of trips and stop sequences.
+
+    """
+
+    def __init__(self, buffer_size, problem_reporter=None):
+        """
+        :param buffer_size: Amount of stop times held in memory while writing
+        """
+        gtfs_factory = transitfeed.GetGtfsFactory()
+        gtfs_factory.UpdateClass('Trip', SpooledTrip)
+        transitfeed.Schedule.__init__(self, problem_reporter=problem_reporter,
+                                      memory_db=False, gtfs_factory=gtfs_factory)
+        self.buffer_size = buffer_size
+        self.stop_times_spool = None
+
+    def AddRouteObject(self, route, problem_reporter=None):
+        # pylint: disable=invalid-name,protected-access
+        """Adds a route, which creates its trips as SpooledTrip objects
+
+        Routes fall back to the default factory of transitfeed otherwise.
+
+        """
+        route._gtfs_factory = self._gtfs_factory
+        transitfeed.Schedule.AddRouteObject(self, route, problem_reporter)
+
+    def WriteGoogleTransitFeed(self, file):
+        # pylint: disable=invalid-name,redefined-builtin
+        """Writes the feed like transitfeed, but the stop_times file through a
+        StopTimesSpool
+
+        :param file: Filename or file object of the zip file
+
+        """
+        columns = self._gtfs_factory.StopTime._FIELD_NAMES  # pylint: disable=protected-access
+        spool = StopTimesSpool(columns, self.buffer_size)
+        try:
+            for trip in self.GetTripList():
+                spool.add_rows(stop_time.GetFieldValuesTuple(trip.trip_id)
+                               for stop_time in trip.GetStopTimes())
+            logging.info("Spilled stop times in %s sorted runs", spool.get_runs_count())
+
+            self.stop_times_spool = spool
+            transitfeed.Schedule.WriteGoogleTransitFeed(self, file)
+        finally:
+            self.stop_times_spool = None
+            spool.close()
+
+    def _WriteArchiveString(self, archive, filename, stringio):
+        # pylint: disable=invalid-name
+        if filename == 'stop_times.txt' and self.stop_times_spool is not None:
+            self.stop_times_spool.write(archive, filename)
+        else:
+            transitfeed.Schedule._WriteArchiveString(self, archive, filename, stringio)
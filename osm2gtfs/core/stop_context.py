@@ -0,0 +1,108 @@
+# coding=utf-8
+
+
+class StopContext(object):
+    """The StopContext class resolves stops for the creators
+
+    It is built once per run from the stops and stations of the
+    OsmConnector and is not changed afterwards. All lookups are done in
+    indexes, which are prepared right away, so creators don't need to scan
+    the stops again.
+
+    Stops and stations are identified by their OpenStreetMap type and id,
+    e.g. "node/123", like in the itineraries.
+
+    """
+
+    def __init__(self, stops):
+        """
+        :param stops: Dictionary of the "regular" stops and "stations"
+        """
+        self._stops = stops.get('regular', {})
+        self._stations = stops.get('stations', {})
+
+        # Index of the Station each Stop is a member of. A Stop belonging to
+        # more than one Station keeps the first one, like in the GTFS.
+        self._parent_stations = {}
+        self._members = {}
+        for station_identifier, station in self._stations.items():
+            members = station.get_members()
+            for member in members:
+                self._parent_stations.setdefault(member, station_identifier)
+                if isinstance(members, dict):
+                    self._members.setdefault(member, members[member])
+
+        # Names of stops and stations as unicode strings, to be compared with
+        # the schedule
+        self._names = {}
+        for identifier, stop in self._stops.items() + self._stations.items():
+            name = stop.name
+            if isinstance(name, str):
+                name = name.decode('utf-8')
+            self._names[identifier] = name
+
+    def get_stops(self):
+        """
+        :return stops: Dictionary of all regular Stops by identifier; not to
+            be changed
+        """
+        return self._stops
+
+    def get_stations(self):
+        """
+        :return stations: Dictionary of all Stations by identifier; not to be
+            changed
+        """
+        return self._stations
+
+    def get_stop(self, identifier):
+        """
+        :return stop: Stop object or None
+        """
+        return self._stops.get(identifier)
+
+    def get_member(self, identifier):
+        """
+        :return stop: Stop object, which is a member of a Station, or None
+        """
+        return self._members.get(identifier)
+
+    def get_station(self, identifier):
+        """
+        :return station: Station object or None
+        """
+        return self._stations.get(identifier)
+
+    def get_parent_station(self, identifier):
+        """
+        :return station: Station object the Stop is a member of, or None
+        """
+        return self._stations.get(self._parent_stations.get(identifier))
+
+    def get_name(self, identifier):
+        """
+        :return name: Unicode name of a Stop or Station, or None
+        """
+        return self._names.get(identifier)
+
+    def get_parent_station_name(self, identifier):
+        """
+        :return name: Unicode name of the Station the Stop is a member of, or
+            None
+        """
+        return self._names.get(self._parent_stations.get(identifier))
+
+    def get_gtfs_stops(self, feed):
+        """Resolves the GTFS stops of all regular Stops
+
+        To be called after the stops were added to the GTFS feed.
+
+        :return gtfs_stops: Dictionary of GTFS stop objects by identifier of
+            the Stop; Stops, which are not part of the feed, are left out
+        """
+        gtfs_stops = {}
+        for identifier, stop in self._stops.items():
+            gtfs_stop = feed.stops.get(str(stop.stop_id))
+            if gtfs_stop is not None:
+                gtfs_stops[identifier] = gtfs_stop
+        return gtfs_stops
@@ -0,0 +1,120 @@
+# coding=utf-8
+
+import os
+import heapq
+import tempfile
+import zipfile
+from transitfeed import util
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class StopTimesSpool(object):
+    """The StopTimesSpool class sorts rows of the stop_times file externally
+
+    Rows are buffered in memory until the buffer size is reached. Then the
+    buffer is sorted by trip and stop sequence and spilled as a run to a
+    temporary file. When writing, all runs are merged, so the amount of
+    rows held in memory doesn't depend on the size of the feed.
+
+    """
+
+    def __init__(self, columns, buffer_size):
+        """
+        :param columns: Field names of the rows
+        :param buffer_size: Amount of rows held in memory before they are
+            spilled to a temporary file
+        """
+        self.columns = columns
+        self.buffer_size = max(1, buffer_size)
+        self._trip_id_idx = columns.index('trip_id')
+        self._stop_sequence_idx = columns.index('stop_sequence')
+        self._buffer = []
+        self._runs = []
+
+    def add_rows(self, rows):
+        """
+        :param rows: Iterable of tuples of values, in the order of the
+            columns
+        """
+        for row in rows:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.buffer_size:
+                self._spill()
+
+    def get_runs_count(self):
+        return len(self._runs)
+
+    def _get_key(self, row):
+        return row[self._trip_id_idx], int(row[self._stop_sequence_idx])
+
+    def _spill(self):
+        """Helper function to write the sorted buffer as a run to a
+        temporary file
+
+        """
+        self._buffer.sort(key=self._get_key)
+        run = tempfile.TemporaryFile()
+        for row in self._buffer:
+            pickle.dump(row, run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+        self._runs.append(run)
+        self._buffer = []
+
+    @staticmethod
+    def _read_run(run):
+        """Helper function to read the rows of a run one by one
+
+        """
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+
+    def get_rows(self):
+        """Merges the runs and the buffer
+
+        :return rows: Iterator of all rows, ordered by trip and stop sequence
+
+        """
+        self._buffer.sort(key=self._get_key)
+        sources = [self._read_run(run) for run in self._runs] + [iter(self._buffer)]
+        decorated = [((self._get_key(row), row) for row in source) for source in sources]
+        for _, row in heapq.merge(*decorated):
+            yield row
+
+    def write(self, archive, filename):
+        """Writes all rows as a CSV file into a zip archive
+
+        The file is prepared in a temporary file, so it never needs to be
+        held in memory as a whole.
+
+        :param archive: ZipFile object opened for writing
+        :param filename: Name of the file in the archive
+
+        """
+        handle, path = tempfile.mkstemp(suffix=".txt")
+        try:
+            with os.fdopen(handle, 'wb') as csv_file:
+                writer = util.CsvUnicodeWriter(csv_file)
+                writer.writerow(self.columns)
+                for row in self.get_rows():
+                    writer.writerow(row)
+
+            # Use the same permissions as transitfeed for the other files
+            os.chmod(path, 0666)
+            archive.write(path, filename, zipfile.ZIP_DEFLATED)
+        finally:
+            os.remove(path)
+
+    def close(self):
+        """Removes all temporary files
+
+        """
+        for run in self._runs:
+            run.close()
+        self._runs = []
+        self._buffer = []
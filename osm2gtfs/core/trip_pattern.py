@@ -0,0 +1,86 @@
+# coding=utf-8
+
+from transitfeed import util
+
+
+class TripPattern(object):
+    """The TripPattern class holds the stops and travel times shared by
+    trips
+
+    Times are kept as offsets to the departure at the first stop, so a trip
+    is described by its pattern and its start time only. Times of stops
+    without time information are interpolated once for the pattern, in the
+    same way as transitfeed's Trip.GetTimeInterpolatedStops does.
+
+    """
+
+    def __init__(self, stops, offsets):
+        """
+        :param stops: Tuple of GTFS stop objects
+        :param offsets: Tuple of seconds since the departure at the first
+            stop, or None for stops without time information
+        """
+        self.stops = stops
+        self.offsets = offsets
+
+        # Interpolation of stops without time information, as tuples of the
+        # share of the distance between the surrounding timed stops and
+        # their offsets
+        self._interpolation = self._interpolate(stops, offsets)
+
+    @staticmethod
+    def get_key(stop_times):
+        """
+        :param stop_times: List of tuples of GTFS stop object and time
+        :return key: Tuple identifying the pattern of the stop times
+        """
+        start_time = stop_times[0][1]
+        return tuple((gtfs_stop.stop_id, None if time is None else time - start_time)
+                     for gtfs_stop, time in stop_times)
+
+    @staticmethod
+    def _interpolate(stops, offsets):
+        interpolation = [None] * len(stops)
+        timed = [i for i, offset in enumerate(offsets) if offset is not None]
+        for previous_timed, next_timed in zip(timed, timed[1:]):
+            if next_timed - previous_timed < 2:
+                continue
+            distances = [0.0]
+            for i in range(previous_timed + 1, next_timed + 1):
+                distances.append(
+                    distances[-1] + util.ApproximateDistanceBetweenStops(stops[i - 1], stops[i]))
+            for i in range(previous_timed + 1, next_timed):
+                distance_percent = distances[i - previous_timed] / distances[-1] \
+                    if distances[-1] else 0.0
+                interpolation[i] = (distance_percent, offsets[previous_timed],
+                                    offsets[next_timed])
+        return interpolation
+
+    def is_complete(self):
+        """
+        :return complete: True, if all stops get a time
+        """
+        return self.offsets[0] is not None and self.offsets[-1] is not None
+
+    def get_stop_times(self, start_time):
+        """
+        Expand the pattern for a trip.
+
+        :param start_time: Departure at the first stop in seconds since
+            midnight
+        :return stop_times: List of tuples of GTFS stop object and time in
+            seconds since midnight, or None for stops which can't be
+            interpolated
+        """
+        stop_times = []
+        for stop, offset, interpolation in zip(self.stops, self.offsets, self._interpolation):
+            if offset is not None:
+                time = start_time + offset
+            elif interpolation is not None:
+                distance_percent, previous_offset, next_offset = interpolation
+                time = int(round(distance_percent * (next_offset - previous_offset) +
+                                 (start_time + previous_offset)))
+            else:
+                time = None
+            stop_times.append((stop, time))
+        return stop_times
@@ -2,7 +2,7 @@
 
 import logging
 
-from osm2gtfs.core.elements import Line, Itinerary, Station, Stop
+from osm2gtfs.core.elements import Line, Itinerary
 from osm2gtfs.creators.routes_creator import RoutesCreator
 
 
@@ -14,15 +14,15 @@ class RoutesCreatorBrFlorianopolis(RoutesCreator):
         for the handling in the custom trips creators.
         '''
         routes = data.get_routes()
-        stops = data.get_stops()
+        stop_context = data.get_stop_context()
 
         # Loop through routes
         for ref, route in routes.iteritems():
             # Replace stop ids with Stop objects
-            self._fill_stops(stops['regular'], route)
+            self._fill_stops(stop_context, route)
         return
 
-    def _fill_stops(self, stops, route):
+    def _fill_stops(self, stop_context, route):
         """
         Fill a route object with stop objects for of linked stop ids
         """
@@ -30,7 +30,7 @@ class RoutesCreatorBrFlorianopolis(RoutesCreator):
             i = 0
             for stop in route.stops:
                 # Replace stop id with Stop objects
-                looked_up_stop = self._look_up_stop(stop, stops)
+                looked_up_stop = self._look_up_stop(stop, stop_context)
                 if looked_up_stop is None:
                     logging.error("Missing stop for route %s: https://osm.org/%s",
                                   route.tags['ref'], route.stops[i])
@@ -41,19 +41,16 @@ class RoutesCreatorBrFlorianopolis(RoutesCreator):
         elif isinstance(route, Line):
             itineraries = route.get_itineraries()
             for itinerary in itineraries:
-                self._fill_stops(stops, itinerary)
+                self._fill_stops(stop_context, itinerary)
         else:
             logging.error("Unknown route: %s", str(route))
 
-    def _look_up_stop(self, stop_id, stops):
-        for ref, elem in stops.iteritems():
-            if type(elem) is Stop:
-                if ref == stop_id:
-                    return elem
-            elif type(elem) is Station:
-                if stop_id in elem.stop_members:
-                    return elem.stop_members[stop_id]
-            else:
-                logging.error("Unknown stop: %s", str(stop_id))
-                return None
-        return None
+    def _look_up_stop(self, stop_id, stop_context):
+        """
+        Look up the Stop object of a stop id, either among the regular stops
+        or among the members of the stations
+        """
+        stop = stop_context.get_stop(stop_id)
+        if stop is None:
+            stop = stop_context.get_member(stop_id)
+        return stop
@@ -26,8 +26,77 @@ SUNDAY = "Domingo"
 NO_DURATION = "não encontrado"
 
 
+class StopNameIndex(object):
+    """
+    Index of the normalized names of the stops in the Fenix data
+
+    Names are looked up exactly or, optionally, by the similarity of their
+    trigrams. Similar names are found through an inverted index of trigrams
+    instead of comparing all names.
+    """
+
+    def __init__(self, names, normalize):
+        """
+        :param names: Original names in the order of their priority
+        :param normalize: Function to normalize a name
+        """
+        # Normalized name to its position and its first original name
+        self._names = {}
+        for position, name in enumerate(names):
+            self._names.setdefault(normalize(name), (position, name))
+        self._trigrams = None
+        self._trigram_counts = None
+
+    def get(self, name):
+        """
+        :return match: Tuple of position and original name, or None
+        """
+        return self._names.get(name)
+
+    def get_similar(self, name, min_similarity):
+        """
+        Find the most similar name, measured by the Dice coefficient of the
+        trigrams of both names.
+
+        :return match: Tuple of position and original name, or None
+        """
+        if self._trigrams is None:
+            self._trigrams = {}
+            self._trigram_counts = {}
+            for normalized_name in self._names:
+                trigrams = self.get_trigrams(normalized_name)
+                self._trigram_counts[normalized_name] = len(trigrams)
+                for trigram in trigrams:
+                    self._trigrams.setdefault(trigram, set()).add(normalized_name)
+
+        trigrams = self.get_trigrams(name)
+        shared = {}
+        for trigram in trigrams:
+            for normalized_name in self._trigrams.get(trigram, ()):
+                shared[normalized_name] = shared.get(normalized_name, 0) + 1
+
+        best_match = None
+        for normalized_name, count in shared.iteritems():
+            similarity = 2.0 * count / (len(trigrams) + self._trigram_counts[normalized_name])
+            if similarity < min_similarity:
+                continue
+            # prefer the most similar name, then the first one
+            candidate = (-similarity, self._names[normalized_name])
+            if best_match is None or candidate < best_match:
+                best_match = candidate
+        return best_match[1] if best_match is not None else None
+
+    @staticmethod
+    def get_trigrams(name):
+        name = u"  " + u" ".join(name.lower().split()) + u" "
+        return set(name[i:i + 3] for i in range(len(name) - 2))
+
+
 class TripsCreatorBrFlorianopolis(TripsCreator):
 
+    # Normalized stop names by original name
+    _normalized_names = {}
+
     def __init__(self, config):
         super(TripsCreatorBrFlorianopolis, self).__init__(config)
 
@@ -55,6 +124,17 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
 
         self.exceptions = None
 
+        # Express service exceptions either by separate one-day service
+        # periods ("service_periods") or by calendar_dates of the shared
+        # service periods ("calendar_dates")
+        self.exceptions_mode = self.config.get('schedule_exceptions', "service_periods")
+
+        # Indexes of the stop names of the Fenix data, by their names
+        self._stop_name_indexes = {}
+
+        # Minimal similarity of stop names, which don't match exactly
+        self.name_similarity = self.config.get('stops', {}).get('name_similarity')
+
     def add_trips_to_feed(self, feed, data):
         routes = data.get_routes()
         feed.AddServicePeriodObject(self.service_weekday)
@@ -142,6 +222,11 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
             if date < self.start_date:
                 continue
 
+            if self.exceptions_mode == "calendar_dates":
+                # the trips of the regular schedule are shared
+                self.add_exception_dates(date, day)
+                continue
+
             service = self.get_exception_service_period(feed, date, day)
             if day == SATURDAY:
                 self.add_trips_by_day(feed, line, service, route, saturday, SATURDAY)
@@ -185,14 +270,7 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
             print day + " - " + key
 
         # get shape id
-        shape_id = str(route.route_id)
-        try:
-            feed.GetShape(shape_id)
-        except KeyError:
-            shape = transitfeed.Shape(shape_id)
-            for point in route.shape:
-                shape.AddPoint(lat=float(point["lat"]), lon=float(point["lon"]))
-            feed.AddShapeObject(shape)
+        shape_id = self._add_shape_to_feed(feed, route.route_id, route)
 
         if len(horarios) > 1 and route.line is None:
             sys.stderr.write(
@@ -202,17 +280,14 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
         for time_group in horarios[key]:
             for time_point in time_group:
                 # parse first departure time
-                start_time = datetime.strptime(time_point[0], "%H:%M")
-                start_time = str(start_time.time())
+                start_sec = Helper.get_seconds_since_midnight(time_point[0])
 
                 # calculate last arrival time for GTFS
-                start_sec = transitfeed.TimeToSecondsSinceMidnight(start_time)
                 factor = 1
                 if len(horarios) > 1 and route.line is None:
                     # since this route has only one instead of two trips, double the duration
                     factor = 2
                 end_sec = start_sec + route.duration.seconds * factor
-                end_time = transitfeed.FormatSecondsSinceMidnight(end_sec)
 
                 # TODO handle options
                 # opts = time_point[1]
@@ -226,11 +301,36 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
                 trip.direction_id = ""
                 if route.route_id == DEBUG_ROUTE:
                     print "ADD TRIP " + str(trip.trip_id) + ":"
-                self.add_trip_stops(feed, trip, route, start_time, end_time)
+                self.add_trip_stops(feed, trip, route, start_sec, end_sec)
 
                 # interpolate times, because Navitia can not handle this itself
                 Helper.interpolate_stop_times(trip)
 
+    def add_exception_dates(self, date, day):
+        """
+        Move a date from its regular service period to the one of the day
+        type it is served like, as calendar_dates of both service periods
+        """
+        if day == SATURDAY:
+            service = self.service_saturday
+        elif day == SUNDAY:
+            service = self.service_sunday
+        else:
+            sys.stderr.write("ERROR: Unknown day %s\n" % day)
+            return
+
+        if date.weekday() <= 4:
+            regular_service = self.service_weekday
+        elif date.weekday() == 5:
+            regular_service = self.service_saturday
+        else:
+            regular_service = self.service_sunday
+
+        if service is not regular_service:
+            date_string = date.strftime("%Y%m%d")
+            regular_service.SetDateHasService(date_string, False)
+            service.SetDateHasService(date_string, True)
+
     def get_exception_service_period(self, feed, date, day):
         date_string = date.strftime("%Y%m%d")
         if date.weekday() <= 4:
@@ -267,12 +367,20 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
         alt_stop_name = self.normalize_stop_name(alt_stop_name)
 
         # trying to match first stop from OSM with SIM
-        for o_sim_stop in sim_stops:
-            sim_stop = self.normalize_stop_name(o_sim_stop)
-            if sim_stop == stop.name:
-                return o_sim_stop
-            elif sim_stop == alt_stop_name:
-                return o_sim_stop
+        index = self._get_stop_name_index(sim_stops)
+        matches = [match for match in [index.get(stop.name), index.get(alt_stop_name)]
+                   if match is not None]
+        if not matches and self.name_similarity:
+            matches = [match for match in [
+                index.get_similar(stop.name, float(self.name_similarity)),
+                index.get_similar(alt_stop_name, float(self.name_similarity))]
+                       if match is not None]
+            if matches:
+                logging.info("Matched similar stop name for %s: '%s'",
+                             route.osm_url, min(matches)[1])
+        if matches:
+            # the first of the SIM stops matching
+            return min(matches)[1]
 
         # print some debug information when no stop match found
         sys.stderr.write(str(route.osm_url) + "\n")
@@ -286,8 +394,20 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
         print
         return None
 
+    def _get_stop_name_index(self, sim_stops):
+        key = tuple(sim_stops)
+        if key not in self._stop_name_indexes:
+            self._stop_name_indexes[key] = StopNameIndex(sim_stops, self.normalize_stop_name)
+        return self._stop_name_indexes[key]
+
+    @classmethod
+    def normalize_stop_name(cls, old_name):
+        if old_name not in cls._normalized_names:
+            cls._normalized_names[old_name] = cls._normalize_stop_name(old_name)
+        return cls._normalized_names[old_name]
+
     @staticmethod
-    def normalize_stop_name(old_name):
+    def _normalize_stop_name(old_name):
         name = STOP_REGEX.sub(r'\1', old_name)
         if type(name).__name__ == 'str':
             name = name.decode('utf-8')
@@ -298,7 +418,7 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
         return name
 
     @staticmethod
-    def add_trip_stops(feed, trip, route, start_time, end_time):
+    def add_trip_stops(feed, trip, route, start_sec, end_sec):
         if isinstance(route, Itinerary):
             i = 1
             for stop in route.stops:
@@ -307,13 +427,19 @@ class TripsCreatorBrFlorianopolis(TripsCreator):
                     if i == 1:
                         # timepoint="1" (Times are considered exact)
                         if route.route_id == DEBUG_ROUTE:
-                            logging.info("START: %s at %s", start_time, str(stop))
-                        trip.AddStopTime(feed.GetStop(str(stop.stop_id)), stop_time=start_time)
+                            logging.info("START: %s at %s",
+                                         transitfeed.FormatSecondsSinceMidnight(start_sec),
+                                         str(stop))
+                        trip.AddStopTime(feed.GetStop(str(stop.stop_id)),
+                                         arrival_secs=start_sec, departure_secs=start_sec)
                     elif i == len(route.stops):
                         # timepoint="0" (Times are considered approximate)
                         if route.route_id == DEBUG_ROUTE:
-                            logging.info("END: %s at %s", end_time, str(stop))
-                        trip.AddStopTime(feed.GetStop(str(stop.stop_id)), stop_time=end_time)
+                            logging.info("END: %s at %s",
+                                         transitfeed.FormatSecondsSinceMidnight(end_sec),
+                                         str(stop))
+                        trip.AddStopTime(feed.GetStop(str(stop.stop_id)),
+                                         arrival_secs=end_sec, departure_secs=end_sec)
                     else:
                         # timepoint="0" (Times are considered approximate)
                         if route.route_id == DEBUG_ROUTE:
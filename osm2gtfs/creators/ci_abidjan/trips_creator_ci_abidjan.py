@@ -1,12 +1,9 @@
 # coding=utf-8
 import logging
-import collections
-from datetime import timedelta, datetime
 import transporthours
 from transitfeed import ServicePeriod
 
 from osm2gtfs.creators.trips_creator import TripsCreator
-from osm2gtfs.core.helper import Helper
 from osm2gtfs.core.elements import Line
 
 
@@ -29,36 +26,92 @@ class TripsCreatorCiAbidjan(TripsCreator):
     }
     _DEFAULT_TRIP_DURATION = 120  # minutes
 
-    def _service_id_from_transport_hour(self, a_transport_hour):
-        service_days = [day_name for day_name in self._DAYS_OF_WEEK
-                        if day_name in a_transport_hour and a_transport_hour[day_name]]
+    # Tags read by transporthours
+    _TRANSPORT_HOURS_TAGS = ('opening_hours', 'interval', 'interval:conditional')
 
-        if not service_days:
-            logging.warning(
-                'Transport_hour missing service days. Assuming 7 days a week.')
-            service_days = self._DAYS_OF_WEEK
+    def __init__(self, config):
+        super(TripsCreatorCiAbidjan, self).__init__(config)
 
-        def date_range(start, end):
-            return self._DAY_ABBREVIATIONS[start] + '-' + self._DAY_ABBREVIATIONS[end]
+        self._transport_hours = transporthours.main.Main()
+
+        # Parsed hours and hours grouped by service period, by the values of
+        # the _TRANSPORT_HOURS_TAGS
+        self._transport_hours_cache = {}
+        self._grouped_hours_cache = {}
+
+        # Service ids by mask of service days
+        self._service_ids = self._get_service_ids()
 
-        if collections.Counter(service_days) == collections.Counter(self._DAYS_OF_WEEK):
-            return date_range('monday', 'sunday')
-        if collections.Counter(service_days) == collections.Counter(self._DAYS_OF_WEEK[:5]):
-            return date_range('monday', 'friday')
-        if collections.Counter(service_days) == collections.Counter(self._DAYS_OF_WEEK[:6]):
-            return date_range('monday', 'saturday')
-        if collections.Counter(service_days) == collections.Counter(self._DAYS_OF_WEEK[-2:]):
-            return date_range('saturday', 'sunday')
+    @classmethod
+    def _get_service_ids(cls):
+        """
+        Prepare the service ids for all combinations of service days, given
+        as 7 bit masks (with Monday as the lowest bit)
 
-        return ','.join([self._DAY_ABBREVIATIONS[day_name] for day_name in service_days])
+        :return service_ids: List of service ids by mask
+        """
+        def date_range(start, end):
+            return cls._DAY_ABBREVIATIONS[start] + '-' + cls._DAY_ABBREVIATIONS[end]
+
+        service_ids = []
+        for mask in range(2 ** len(cls._DAYS_OF_WEEK)):
+            service_ids.append(','.join(
+                [cls._DAY_ABBREVIATIONS[day_name]
+                 for i, day_name in enumerate(cls._DAYS_OF_WEEK) if mask & (1 << i)]))
+        service_ids[0b1111111] = date_range('monday', 'sunday')
+        service_ids[0b0011111] = date_range('monday', 'friday')
+        service_ids[0b0111111] = date_range('monday', 'saturday')
+        service_ids[0b1100000] = date_range('saturday', 'sunday')
+        return service_ids
+
+    def _get_service_days_mask(self, a_transport_hour):
+        mask = 0
+        for i, day_name in enumerate(self._DAYS_OF_WEEK):
+            if day_name in a_transport_hour and a_transport_hour[day_name]:
+                mask |= 1 << i
+        return mask
+
+    def _service_id_from_transport_hour(self, a_transport_hour):
+        mask = self._get_service_days_mask(a_transport_hour)
+        if not mask:
+            logging.warning(
+                'Transport_hour missing service days. Assuming 7 days a week.')
+            mask = 0b1111111
+        return self._service_ids[mask]
+
+    def _get_transport_hours(self, tags):
+        """
+        Parse the hours of a route from its tags, once for each combination of
+        tags
+
+        :return hours: List of transport hours; not to be changed
+        """
+        key = tuple(tags.get(tag) for tag in self._TRANSPORT_HOURS_TAGS)
+        if key not in self._transport_hours_cache:
+            self._transport_hours_cache[key] = self._transport_hours.tagsToGtfs(tags)
+        return self._transport_hours_cache[key]
+
+    def _get_hours_by_service_period(self, feed, tags):
+        """
+        Group the hours of a route by service period, once for each
+        combination of tags
+
+        :return hours: Dictionary of lists of transport hours by service id
+        """
+        key = tuple(tags.get(tag) for tag in self._TRANSPORT_HOURS_TAGS)
+        if key not in self._grouped_hours_cache:
+            self._grouped_hours_cache[key] = self._group_hours_by_service_period(
+                feed, self._get_transport_hours(tags))
+        return self._grouped_hours_cache[key]
 
     def _init_service_period(self, feed, hour):
         service_id = self._service_id_from_transport_hour(hour)
         service_period = ServicePeriod(id=service_id)
         service_period.SetStartDate(self.config['feed_info']['start_date'])
         service_period.SetEndDate(self.config['feed_info']['end_date'])
-        for i, day_of_week in enumerate(self._DAYS_OF_WEEK):
-            if (day_of_week in hour and hour[day_of_week]):
+        mask = self._get_service_days_mask(hour)
+        for i in range(len(self._DAYS_OF_WEEK)):
+            if mask & (1 << i):
                 service_period.SetDayOfWeekHasService(i)
         feed.AddServicePeriodObject(service_period)
         return service_period
@@ -79,14 +132,13 @@ class TripsCreatorCiAbidjan(TripsCreator):
         return transport_hours_dict
 
     def add_trips_to_feed(self, feed, data):
-        transport_hours = transporthours.main.Main()
-        default_hours = transport_hours.tagsToGtfs(self._DEFAULT_SCHEDULE)
+        default_hours = self._get_transport_hours(self._DEFAULT_SCHEDULE)
 
         default_service_period = self._init_service_period(
             feed, default_hours[0])
         feed.SetDefaultServicePeriod(default_service_period)
-        default_hours_dict = self._group_hours_by_service_period(
-            feed, default_hours)
+        default_hours_dict = self._get_hours_by_service_period(
+            feed, self._DEFAULT_SCHEDULE)
 
         lines = data.routes
 
@@ -129,16 +181,14 @@ class TripsCreatorCiAbidjan(TripsCreator):
             route_index = 0
             itineraries = line.get_itineraries()
 
-            line_hours_list = transport_hours.tagsToGtfs(line.tags)
-            line_hours_dict = self._group_hours_by_service_period(
-                feed, line_hours_list)
+            line_hours_dict = self._get_hours_by_service_period(feed, line.tags)
 
             for a_route in itineraries:
-                itinerary_hours_list = transport_hours.tagsToGtfs(a_route.tags)
+                itinerary_hours_list = self._get_transport_hours(a_route.tags)
 
                 if itinerary_hours_list:
-                    itinerary_hours_dict = self._group_hours_by_service_period(
-                        feed, itinerary_hours_list)
+                    itinerary_hours_dict = self._get_hours_by_service_period(
+                        feed, a_route.tags)
                 elif line_hours_dict:
                     itinerary_hours_dict = line_hours_dict
                 else:
@@ -148,32 +198,6 @@ class TripsCreatorCiAbidjan(TripsCreator):
                         " Add opening_hours & interval tags in OSM - %s", line.osm_url)
 
                 for service_id, itinerary_hours in itinerary_hours_dict.items():
-                    service_period = feed.GetServicePeriod(service_id)
-                    trip_gtfs = line_gtfs.AddTrip(
-                        feed, service_period=service_period)
-                    trip_gtfs.shape_id = self._add_shape_to_feed(
-                        feed, a_route.osm_id, a_route)
-                    trip_gtfs.direction_id = route_index % 2
-                    route_index += 1
-
-                    if a_route.fr and a_route.to:
-                        trip_gtfs.trip_headsign = a_route.to
-                        if line_gtfs.route_short_name:
-                            # The line.name in the OSM data (route_long_name in the GTFS)
-                            # is in the following format:
-                            # '{transport mode} {route_short_name if any} :
-                            # {A terminus} ↔ {The other terminus}'
-                            # But it is good practice to not repeat the route_short_name
-                            # in the route_long_name,
-                            # so we abridge the route_long_name here if needed
-                            line_gtfs.route_long_name = a_route.fr + \
-                                " ↔ ".decode('utf-8') + a_route.to
-
-                    for itinerary_hour in itinerary_hours:
-                        trip_gtfs.AddFrequency(
-                            itinerary_hour['start_time'], itinerary_hour['end_time'],
-                            itinerary_hour['headway'])
-
                     if 'duration' in a_route.tags:
                         try:
                             travel_time = int(a_route.tags['duration'])
@@ -196,26 +220,27 @@ class TripsCreatorCiAbidjan(TripsCreator):
                         logging.warning(
                             " Add a duration tag in OSM - %s", a_route.osm_url)
 
-                    for index_stop, a_stop in enumerate(a_route.stops):
-                        stop_id = a_stop
-                        departure_time = datetime(2008, 11, 22, 6, 0, 0)
-
-                        if index_stop == 0:
-                            trip_gtfs.AddStopTime(feed.GetStop(
-                                str(stop_id)), stop_time=departure_time.strftime(
-                                    "%H:%M:%S"))
-                        elif index_stop == len(a_route.stops) - 1:
-                            departure_time += timedelta(minutes=travel_time)
-                            trip_gtfs.AddStopTime(feed.GetStop(
-                                str(stop_id)), stop_time=departure_time.strftime(
-                                    "%H:%M:%S"))
-                        else:
-                            trip_gtfs.AddStopTime(feed.GetStop(str(stop_id)))
-
-                    for secs, stop_time, is_timepoint in trip_gtfs.GetTimeInterpolatedStops():
-                        if not is_timepoint:
-                            stop_time.arrival_secs = secs
-                            stop_time.departure_secs = secs
-                            trip_gtfs.ReplaceStopTimeObject(stop_time)
-
-                    Helper.interpolate_stop_times(trip_gtfs)
+                    service_period = feed.GetServicePeriod(service_id)
+                    trip_gtfs = self._add_frequency_trip(
+                        feed, line_gtfs, [feed.GetStop(str(a_stop)) for a_stop in a_route.stops],
+                        travel_time,
+                        [(itinerary_hour['start_time'], itinerary_hour['end_time'],
+                          itinerary_hour['headway']) for itinerary_hour in itinerary_hours],
+                        service_period)
+                    trip_gtfs.shape_id = self._add_shape_to_feed(
+                        feed, a_route.osm_id, a_route, data.get_stop_context().get_stops())
+                    trip_gtfs.direction_id = route_index % 2
+                    route_index += 1
+
+                    if a_route.fr and a_route.to:
+                        trip_gtfs.trip_headsign = a_route.to
+                        if line_gtfs.route_short_name:
+                            # The line.name in the OSM data (route_long_name in the GTFS)
+                            # is in the following format:
+                            # '{transport mode} {route_short_name if any} :
+                            # {A terminus} ↔ {The other terminus}'
+                            # But it is good practice to not repeat the route_short_name
+                            # in the route_long_name,
+                            # so we abridge the route_long_name here if needed
+                            line_gtfs.route_long_name = a_route.fr + \
+                                " ↔ ".decode('utf-8') + a_route.to
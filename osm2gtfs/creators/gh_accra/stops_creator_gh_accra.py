@@ -34,10 +34,10 @@ def get_stop_id(stop):
 class StopsCreatorGhAccra(StopsCreator):
 
     def add_stops_to_feed(self, feed, data):
-        stops = data.get_stops()
+        stops = data.get_stop_context().get_stops()
         stops_by_name = {}
 
-        for internal_stop_id, a_stop in stops['regular'].items():
+        for internal_stop_id, a_stop in stops.items():
             if a_stop.name not in stops_by_name:
                 stops_by_name[a_stop.name] = []
             stops_by_name[a_stop.name].append(a_stop)
@@ -1,9 +1,6 @@
 # coding=utf-8
 
-from datetime import timedelta, datetime
-
 from osm2gtfs.creators.trips_creator import TripsCreator
-from osm2gtfs.core.helper import Helper
 from osm2gtfs.core.elements import Line
 
 
@@ -41,18 +38,6 @@ class TripsCreatorGhAccra(TripsCreator):
             route_index = 0
             itineraries = line.get_itineraries()
             for a_route in itineraries:
-                trip_gtfs = line_gtfs.AddTrip(feed)
-                trip_gtfs.shape_id = self._add_shape_to_feed(
-                    feed, a_route.osm_id, a_route)
-                trip_gtfs.direction_id = route_index % 2
-                route_index += 1
-
-                if a_route.fr and a_route.to:
-                    trip_gtfs.trip_headsign = a_route.to
-                    line_gtfs.route_long_name = a_route.fr.decode(
-                        'utf8') + " ↔ ".decode(
-                        'utf8') + a_route.to.decode('utf8')
-
                 DEFAULT_ROUTE_FREQUENCY = 30
                 DEFAULT_TRAVEL_TIME = 120
 
@@ -69,8 +54,6 @@ class TripsCreatorGhAccra(TripsCreator):
                     print("frequency not a number for route_master " + str(
                             line.osm_id))
                     ROUTE_FREQUENCY = DEFAULT_ROUTE_FREQUENCY
-                trip_gtfs.AddFrequency(
-                    "05:00:00", "22:00:00", ROUTE_FREQUENCY * 60)
                 if 'travel_time' in a_route.tags:
                     try:
                         TRAVEL_TIME = int(a_route.tags['travel_time'])
@@ -85,26 +68,18 @@ class TripsCreatorGhAccra(TripsCreator):
                 else:
                     TRAVEL_TIME = DEFAULT_TRAVEL_TIME
 
-                for index_stop, a_stop in enumerate(a_route.stops):
-                    stop_id = a_stop.split('/')[-1]
-                    departure_time = datetime(2008, 11, 22, 6, 0, 0)
-
-                    if index_stop == 0:
-                        trip_gtfs.AddStopTime(feed.GetStop(
-                            str(stop_id)), stop_time=departure_time.strftime(
-                                "%H:%M:%S"))
-                    elif index_stop == len(a_route.stops) - 1:
-                        departure_time += timedelta(minutes=TRAVEL_TIME)
-                        trip_gtfs.AddStopTime(feed.GetStop(
-                            str(stop_id)), stop_time=departure_time.strftime(
-                                "%H:%M:%S"))
-                    else:
-                        trip_gtfs.AddStopTime(feed.GetStop(str(stop_id)))
-
-                for secs, stop_time, is_timepoint in trip_gtfs.GetTimeInterpolatedStops():
-                    if not is_timepoint:
-                        stop_time.arrival_secs = secs
-                        stop_time.departure_secs = secs
-                        trip_gtfs.ReplaceStopTimeObject(stop_time)
+                gtfs_stops = [feed.GetStop(str(a_stop.split('/')[-1]))
+                              for a_stop in a_route.stops]
+                trip_gtfs = self._add_frequency_trip(
+                    feed, line_gtfs, gtfs_stops, TRAVEL_TIME,
+                    [("05:00:00", "22:00:00", ROUTE_FREQUENCY * 60)])
+                trip_gtfs.shape_id = self._add_shape_to_feed(
+                    feed, a_route.osm_id, a_route, data.get_stop_context().get_stops())
+                trip_gtfs.direction_id = route_index % 2
+                route_index += 1
 
-                Helper.interpolate_stop_times(trip_gtfs)
+                if a_route.fr and a_route.to:
+                    trip_gtfs.trip_headsign = a_route.to
+                    line_gtfs.route_long_name = a_route.fr.decode(
+                        'utf8') + " ↔ ".decode(
+                        'utf8') + a_route.to.decode('utf8')
@@ -2,7 +2,9 @@
 
 import sys
 import logging
-import json
+from osm2gtfs.core.cache import Cache
+from osm2gtfs.core.helper import Helper
+from osm2gtfs.core.schedule_reader import ScheduleReader
 
 
 class ScheduleCreator(object):
@@ -13,10 +15,21 @@ class ScheduleCreator(object):
     More information about the standard schedule format:
     https://github.com/grote/osm2gtfs/wiki/Schedule
 
+    The prepared schedule is compiled into the cache. It is reused as long as
+    the schedule source and the VERSION of the schedule creator don't change.
+
     """
+
+    # Version of the prepared schedule; to be increased, whenever the
+    # preparation of the schedule changes
+    VERSION = 2
+
     def __init__(self, config):
         self.config = config
 
+        # Shared instances of all names of the schedule
+        self._names = {}
+
     def __repr__(self):
         rep = ""
         if self.config is not None:
@@ -27,25 +40,52 @@ class ScheduleCreator(object):
         """
         This function adds the loaded schedule to the global data object.
         """
+        key = self._get_compiled_schedule_key()
+        compiled_file = self.config.data['selector'] + '-schedule-compiled'
+
+        compiled = Cache.read_data(compiled_file)
+        if key is not None and compiled.get('key') == key:
+            logging.info("Using compiled schedule from cache")
+            data.schedule = compiled['schedule']
+            return
+
         schedule = self._load_schedule_source()
         data.schedule = self._prepare_schedule(schedule)
+        if key is not None:
+            Cache.write_data(compiled_file, {'key': key, 'schedule': data.schedule})
+
+    def _get_compiled_schedule_key(self):
+        """
+        This function returns the key of the compiled schedule, built from the
+        hash of the schedule source and the version of the schedule creator.
+
+        :return key: Tuple or None, if the schedule source is unknown
+        """
+        source_hash = self.config.get_schedule_source_hash()
+        if source_hash is None:
+            return None
+        return (source_hash, self.__class__.__name__, self.VERSION)
 
     def _load_schedule_source(self):
         """
         This function loads and verifies the content of the file.
         In the standard schedule creator it assumes a json file. This function
         can be overridden to support any type of file format or structure.
+
+        The file is read incrementally and each trip gets prepared right
+        away by _prepare_trip.
         """
 
-        schedule_source = self.config.get_schedule_source()
+        schedule_source_file = self.config.open_schedule_source()
 
-        if schedule_source is None:
+        if schedule_source_file is None:
             logging.error("No schedule source found.")
             sys.exit(0)
 
         else:
             try:
-                schedule = json.loads(schedule_source)
+                with schedule_source_file:
+                    schedule = ScheduleReader(schedule_source_file).read(self._prepare_trip)
             except ValueError, e:
                 logging.error('Schedule file is invalid.')
                 logging.error(e)
@@ -53,6 +93,50 @@ class ScheduleCreator(object):
 
         return schedule
 
+    def _prepare_trip(self, route_id, trip):
+        """
+        This function prepares (if needed) a single trip of a line, while the
+        schedule is read.
+
+        Times are parsed once into seconds since midnight. Names of stations
+        and services are interned, so each name is held in memory (and in the
+        compiled schedule) only once.
+        """
+        # pylint: disable=unused-argument
+        if not isinstance(trip, dict):
+            return trip
+        for key in ["from", "to", "via"]:
+            if isinstance(trip.get(key), basestring):
+                trip[key] = self._intern(trip[key])
+        for key in ["stations", "services"]:
+            if isinstance(trip.get(key), list):
+                trip[key] = [self._intern(name) if isinstance(name, basestring) else name
+                             for name in trip[key]]
+        if isinstance(trip.get("times"), list):
+            trip["times"] = [[self._parse_time(time) for time in times]
+                             if isinstance(times, list) else times
+                             for times in trip["times"]]
+        return trip
+
+    def _intern(self, name):
+        """
+        Helper function to return the shared instance of a name
+        """
+        return self._names.setdefault(name, name)
+
+    @staticmethod
+    def _parse_time(time):
+        """
+        Helper function to parse a time into seconds since midnight. Invalid
+        times are kept as they are, to be reported when trips are created.
+        """
+        if not isinstance(time, basestring):
+            return time
+        try:
+            return Helper.get_seconds_since_midnight(time)
+        except ValueError:
+            return time
+
     def _prepare_schedule(self, schedule):
         """
         This function prepares (if needed) the schedule for further use.
@@ -20,9 +20,9 @@ class StopsCreator(object):
         This function adds the Stops from the data to the GTFS feed.
         It also unites stops in stations based on stop_areas in OpenStreetMap.
         """
-        all_stops = data.get_stops()
-        regular_stops = all_stops['regular']
-        parent_stations = all_stops['stations']
+        stop_context = data.get_stop_context()
+        regular_stops = stop_context.get_stops()
+        parent_stations = stop_context.get_stations()
 
         # Loop through all stations and prepare stops
         for station in parent_stations.values():
@@ -94,11 +94,6 @@ class StopsCreator(object):
         # Add stop to GTFS object
         feed.AddStopObject(transitfeed.Stop(field_dict=field_dict))
 
-        if type(stop_name).__name__ == "unicode":
-            stop_name = stop_name.encode('utf-8')
-
-        logging.info("Added stop: %s - %s", stop_name, stop.osm_url)
-
         # Return the stop_id of the stop added
         return field_dict['stop_id']
 
@@ -2,17 +2,34 @@
 
 import re
 import logging
-from datetime import datetime
+from collections import OrderedDict
 import transitfeed
 from transitfeed import ServicePeriod
 from osm2gtfs.core.helper import Helper
+from osm2gtfs.core.diagnostics import Diagnostics
+from osm2gtfs.core.trip_pattern import TripPattern
 
 
 class TripsCreator(object):
 
+    # Departure time at the first stop of trips served by frequencies
+    FREQUENCY_TRIP_START = 6 * 3600
+
     def __init__(self, config):
         self.config = config.data
 
+        # Compact runs of trips departing in a constant headway into
+        # frequencies, if enabled in the "trips" section of the config file
+        trips_config = self.config.get('trips', {})
+        self.detect_headways = trips_config.get('detect_headways') == "yes"
+        self.headway_min_trips = max(2, int(trips_config.get('headway_min_trips', 3)))
+
+        # Shared patterns of stops and travel times of trips
+        self._trip_patterns = {}
+
+        # Trips added to the feed, by route, pattern, service and start time
+        self._trip_keys = set()
+
     def __repr__(self):
         rep = ""
         if self.config is not None:
@@ -31,11 +48,14 @@ class TripsCreator(object):
         """
         all_trips_count = 0
 
+        # Resolve stops only once for all trips
+        stop_context = data.get_stop_context()
+        gtfs_stops = stop_context.get_gtfs_stops(feed)
+
         # Go though all lines
         for line_id, line in sorted(data.routes.iteritems(), key=lambda k: k[1].route_id):
 
-            logging.info(
-                "\nGenerating schedule for line: [" + line.tags['ref'] + "] - " + line.name)
+            logging.info("Generating schedule for line: [%s] - %s", line.route_id, line.name)
 
             # Loop through its itineraries
             itineraries = line.get_itineraries()
@@ -52,24 +72,24 @@ class TripsCreator(object):
                     # Add itinerary shape to feed.
                     shape_id = self._add_shape_to_feed(
                         feed, itinerary.osm_type + "/" + str(
-                            itinerary.osm_id), itinerary)
+                            itinerary.osm_id), itinerary,
+                        stop_context.get_stops())
 
                     # Add trips of each itinerary to the GTFS feed
                     for trip_builder in prepared_trips:
 
-                        trip_builder['all_stops'] = data.get_stops()
+                        trip_builder['stop_context'] = stop_context
+                        trip_builder['gtfs_stops'] = gtfs_stops
                         trips_count += self._add_itinerary_trips(
                             feed, itinerary, line, trip_builder, shape_id)
 
                 # Print out status messge about added trips
-                logging.info(" Itinerary: [" + itinerary.route_id.encode("utf-8") + "] " +
-                             itinerary.to.encode("utf-8") + " (added " + str(
-                                 trips_count) + " trips, serving " + str(
-                                     len(itinerary.get_stops())) + " stops) - " +
-                             itinerary.osm_url)
+                logging.info(" Itinerary: [%s] %s (added %s trips, serving %s stops) - %s",
+                             itinerary.route_id, itinerary.to, trips_count,
+                             len(itinerary.get_stops()), itinerary.osm_url)
                 all_trips_count += trips_count
 
-        logging.info("\nTotal of added trips to this GTFS: %s\n\n", str(all_trips_count))
+        logging.info("Total of added trips to this GTFS: %s", all_trips_count)
         return
 
     def _prepare_trips(self, feed, schedule, itinerary):
@@ -94,7 +114,8 @@ class TripsCreator(object):
                         services.append(service)
 
         if not services:
-            logging.warning(" From and to values didn't match with schedule.")
+            Diagnostics.add(Diagnostics.SCHEDULE_MISMATCH, itinerary.osm_type,
+                            itinerary.osm_id, "from and to")
 
         # Loop through all service days
         trips = []
@@ -133,7 +154,8 @@ class TripsCreator(object):
         # Check if time information in schedule can be found for
         # the itinerary
         if itinerary.route_id not in schedule['lines']:
-            logging.warning("Route not found in schedule.")
+            Diagnostics.add(Diagnostics.SCHEDULE_MISMATCH, itinerary.osm_type,
+                            itinerary.osm_id, "route not in schedule")
             return False
 
         # Check if from and to tags are valid and correspond to
@@ -142,25 +164,22 @@ class TripsCreator(object):
             if (trip["from"] == itinerary.fr and trip["to"] == itinerary.to):
                 trip_stations = trip["stations"]
                 if trip_stations[0] != itinerary.fr:
-                    logging.warning(
-                        "First station of the route (%s) doesn't match first station of itinerary",
-                        itinerary.route_id)
-                    logging.warning(" %s", itinerary.osm_url)
-                    logging.warning(" Please compare with the schedule file.")
+                    Diagnostics.add(Diagnostics.SCHEDULE_MISMATCH, itinerary.osm_type,
+                                    itinerary.osm_id, "first station")
                     return False
                 elif trip_stations[-1] != itinerary.to:
-                    logging.warning(
-                        "Last station of route (%s) doesn't match last station of itinerary.",
-                        itinerary.route_id)
-                    logging.warning(" %s", itinerary.osm_url)
-                    logging.warning(" Please compare with the schedule file.")
+                    Diagnostics.add(Diagnostics.SCHEDULE_MISMATCH, itinerary.osm_type,
+                                    itinerary.osm_id, "last station")
                     return False
 
         return True
 
-    def _add_shape_to_feed(self, feed, shape_id, itinerary):
+    def _add_shape_to_feed(self, feed, shape_id, itinerary, stops=None):
         """
         Create GTFS shape and return shape_id to add on GTFS trip
+
+        :param stops: Optional dictionary of Stop objects to look up the stops
+            of the itinerary, which are kept when simplifying the shape.
         """
         shape_id = str(shape_id)
 
@@ -169,113 +188,305 @@ class TripsCreator(object):
             feed.GetShape(shape_id)
         except KeyError:
             shape = transitfeed.Shape(shape_id)
-            for point in itinerary.shape:
+            for point in self._prepare_shape(itinerary, stops):
                 shape.AddPoint(
                     lat=float(point["lat"]), lon=float(point["lon"]))
             feed.AddShapeObject(shape)
         return shape_id
 
+    def _prepare_shape(self, itinerary, stops=None):
+        """
+        Prepare the shape of an itinerary for the export to GTFS.
+
+        If a "simplify_tolerance" (in meters) is defined in the "shapes"
+        section of the config file, the shape gets simplified. The shape points
+        closest to the stops of the itinerary are always kept.
+
+        :return shape: List of dictionaries with "lat" and "lon" keys
+        """
+        tolerance = self.config.get('shapes', {}).get('simplify_tolerance')
+        if not tolerance:
+            return itinerary.shape
+
+        anchors = []
+        for stop in itinerary.get_stops():
+            # Stops are either already Stop objects or need to be looked up
+            if isinstance(stop, basestring):
+                stop = stops.get(stop) if stops else None
+            if stop is not None:
+                anchors.append((stop.lat, stop.lon))
+
+        return Helper.simplify_shape(itinerary.shape, float(tolerance), anchors)
+
     def _add_itinerary_trips(self, feed, itinerary, line, trip_builder,
                              shape_id):
         """
         Add all trips of an itinerary to the GTFS feed.
+
+        :return trips_count: Amount of departures added
         """
         # Obtain GTFS route to add trips to it.
         route = feed.GetRoute(line.route_id)
-        trips_count = 0
 
-        # Loop through each timeslot for a trip
-        for trip in trip_builder['schedule']:
-            gtfs_trip = route.AddTrip(feed, headsign=itinerary.to,
-                                      service_period=trip_builder['service_period'])
-            trips_count += 1
-            search_idx = 0
+        # Resolve the stop times of each timeslot for a trip, as its pattern
+        # of stops and travel times and its start time
+        trips = [self._get_trip_pattern(self._get_trip_stop_times(itinerary, trip_builder, trip))
+                 for trip in trip_builder['schedule']]
+        trips = self._drop_duplicate_trips(itinerary, route, trip_builder, trips)
 
-            # Go through all stops of an itinerary
-            for itinerary_stop_idx, itinerary_stop_id in enumerate(itinerary.get_stops()):
+        if self.detect_headways:
+            trips = self._compact_by_headways(trips)
+        else:
+            trips = [(pattern, start_time, None) for pattern, start_time in trips]
 
-                # Load full stop object
-                try:
-                    itinerary_stop = trip_builder[
-                        'all_stops']['regular'][itinerary_stop_id]
-                except ValueError:
-                    logging.warning(
-                        "Itinerary (%s) misses a stop:", itinerary.route_url)
-                    logging.warning(
-                        " Please review: %s", itinerary_stop_id)
-                    continue
+        trips_count = 0
+        for pattern, start_time, frequency in trips:
+            gtfs_trip = self._add_trip(feed, route, itinerary, trip_builder, pattern, start_time,
+                                       shape_id)
+            if frequency is None:
+                trips_count += 1
+            else:
+                end_time, headway = frequency
+                gtfs_trip.AddFrequency(start_time, end_time, headway, exact_times=1)
+                trips_count += (end_time - start_time) // headway
+        return trips_count
 
-                try:
-                    # Load respective GTFS stop object
-                    gtfs_stop = feed.GetStop(str(itinerary_stop.stop_id))
-                except ValueError:
-                    logging.warning("Stop in itinerary was not found in GTFS.")
-                    logging.warning(" %s", itinerary_stop.osm_url)
-                    continue
+    def _get_trip_stop_times(self, itinerary, trip_builder, trip):
+        """
+        Match the stops of an itinerary with the times of one trip of the
+        schedule.
 
-                # Make sure we compare same unicode encoding
-                if type(itinerary_stop.name) is str:
-                    itinerary_stop.name = itinerary_stop.name.decode('utf-8')
+        :return stop_times: List of tuples of GTFS stop object and time in
+            seconds since midnight, or None for stops without time
+            information
+        """
+        stop_context = trip_builder['stop_context']
+        stop_times = []
+        search_idx = 0
+
+        # Go through all stops of an itinerary
+        for itinerary_stop_idx, itinerary_stop_id in enumerate(itinerary.get_stops()):
+
+            # Load full stop object
+            itinerary_stop = stop_context.get_stop(itinerary_stop_id)
+            if itinerary_stop is None:
+                logging.warning(
+                    "Itinerary (%s) misses a stop:", itinerary.osm_url)
+                logging.warning(
+                    " Please review: %s", itinerary_stop_id)
+                continue
+
+            # Load respective GTFS stop object
+            gtfs_stop = trip_builder['gtfs_stops'].get(itinerary_stop_id)
+            if gtfs_stop is None:
+                logging.warning("Stop in itinerary was not found in GTFS.")
+                logging.warning(" %s", itinerary_stop.osm_url)
+                continue
+
+            schedule_stop_idx = -1
+            # Check if we have specific time information for this stop.
+            try:
+                schedule_stop_idx = trip_builder['stops'].index(
+                    stop_context.get_name(itinerary_stop_id), search_idx)
+            except ValueError:
+                # If stop name not found, check for the parent_station name, too.
+                station_name = stop_context.get_parent_station_name(itinerary_stop_id)
+                if station_name is not None:
+                    try:
+                        schedule_stop_idx = trip_builder[
+                            'stops'].index(station_name, search_idx)
+                    except ValueError:
+                        pass
 
+            # Make sure the last stop of itinerary will keep being the last stop in GTFS
+            last_stop_schedule = schedule_stop_idx == len(trip_builder['stops']) - 1
+            last_stop_itinerary = itinerary_stop_idx == len(itinerary.get_stops()) - 1
+            if last_stop_schedule != last_stop_itinerary:
                 schedule_stop_idx = -1
-                # Check if we have specific time information for this stop.
+
+            if schedule_stop_idx != -1:
+                time = trip[schedule_stop_idx]
+                search_idx = schedule_stop_idx + 1
+
+                # Validate time information, which is usually already
+                # parsed into seconds by the schedule creator
                 try:
-                    schedule_stop_idx = trip_builder['stops'].index(itinerary_stop.name, search_idx)
-                except ValueError:
-                    if itinerary_stop.get_parent_station() is not None:
-                        # If stop name not found, check for the parent_station name, too.
-                        itinerary_station = trip_builder[
-                            'all_stops']['stations'][str(itinerary_stop.get_parent_station())]
-                        if type(itinerary_station.name) is str:
-                            itinerary_station.name = itinerary_station.name.decode('utf-8')
-                        try:
-                            schedule_stop_idx = trip_builder[
-                                'stops'].index(itinerary_station.name, search_idx)
-                        except ValueError:
-                            pass
-
-                # Make sure the last stop of itinerary will keep being the last stop in GTFS
-                last_stop_schedule = schedule_stop_idx == len(trip_builder['stops']) - 1
-                last_stop_itinerary = itinerary_stop_idx == len(itinerary.get_stops()) - 1
-                if last_stop_schedule != last_stop_itinerary:
-                    schedule_stop_idx = -1
-
-                if schedule_stop_idx != -1:
-                    time = trip[schedule_stop_idx]
-                    search_idx = schedule_stop_idx + 1
-
-                    # Validate time information
-                    try:
-                        time_at_stop = str(
-                            datetime.strptime(time, "%H:%M").time())
-                    except ValueError:
-                        logging.warning('Time "%s" for the stop was not valid:', time)
-                        logging.warning(" %s - %s", itinerary_stop.name, itinerary_stop.osm_url)
-                        break
-                    gtfs_trip.AddStopTime(gtfs_stop, stop_time=time_at_stop)
+                    if not isinstance(time, int):
+                        time = Helper.get_seconds_since_midnight(time)
+                except (ValueError, TypeError):
+                    logging.warning('Time "%s" for the stop was not valid:', time)
+                    logging.warning(" %s - %s", itinerary_stop.name, itinerary_stop.osm_url)
+                    break
+                stop_times.append((gtfs_stop, time))
+
+            # Add stop without time information, too (we interpolate later)
+            elif not stop_times:
+                logging.warning(
+                    "Could not add first stop to trip without time information.")
+                logging.warning(" %s - %s", itinerary_stop.name, itinerary_stop.osm_url)
+                break
+            else:
+                stop_times.append((gtfs_stop, None))
+
+        return stop_times
 
-                # Add stop without time information, too (we interpolate later)
+    def _get_trip_pattern(self, stop_times):
+        """
+        Get the shared pattern of stops and travel times of a trip.
+
+        :return trip: Tuple of TripPattern object and start time, or a
+            tuple of None for trips without stop times
+        """
+        if not stop_times:
+            return None, None
+        key = TripPattern.get_key(stop_times)
+        pattern = self._trip_patterns.get(key)
+        if pattern is None:
+            pattern = TripPattern(
+                tuple(gtfs_stop for gtfs_stop, _ in stop_times),
+                tuple(offset for _, offset in key))
+            self._trip_patterns[key] = pattern
+        return pattern, stop_times[0][1]
+
+    def _drop_duplicate_trips(self, itinerary, route, trip_builder, trips):
+        """
+        Drop trips, which were already added with the same stops and times
+        on the same route and service. These occur, when a schedule lists a
+        departure under overlapping services or more than once.
+
+        :param trips: List of tuples of TripPattern object and start time
+        :return trips: List of tuples of TripPattern object and start time
+        """
+        service_id = trip_builder['service_period'].service_id
+        unique_trips = []
+        for pattern, start_time in trips:
+            # Trips without stop times are kept as they are
+            if pattern is not None:
+                key = (route.route_id, pattern, service_id, start_time)
+                if key in self._trip_keys:
+                    start = transitfeed.util.FormatSecondsSinceMidnight(start_time)
+                    Diagnostics.add(Diagnostics.DUPLICATE_TRIP, itinerary.osm_type,
+                                    itinerary.osm_id, "%s %s" % (service_id, start))
+                    continue
+                self._trip_keys.add(key)
+            unique_trips.append((pattern, start_time))
+        return unique_trips
+
+    def _add_trip(self, feed, route, itinerary, trip_builder, pattern, start_time, shape_id):
+        """
+        Add a trip with its stop times, expanded from its pattern, to the
+        GTFS feed.
+
+        :return gtfs_trip: GTFS trip object
+        """
+        gtfs_trip = route.AddTrip(feed, headsign=itinerary.to,
+                                  service_period=trip_builder['service_period'])
+        if pattern is None:
+            return gtfs_trip
+
+        for gtfs_stop, time in pattern.get_stop_times(start_time):
+            if time is None:
+                gtfs_trip.AddStopTime(gtfs_stop)
+            else:
+                gtfs_trip.AddStopTime(gtfs_stop, arrival_secs=time, departure_secs=time)
+
+        # Times of stops without time information are already interpolated
+        if not pattern.is_complete():
+            logging.error("%s must have time at first and last stop", gtfs_trip)
+
+        # Add reference to shape
+        gtfs_trip.shape_id = shape_id
+
+        # Add empty attributes to make navitia happy
+        gtfs_trip.block_id = ""
+        gtfs_trip.wheelchair_accessible = ""
+        gtfs_trip.bikes_allowed = ""
+        gtfs_trip.direction_id = ""
+        return gtfs_trip
+
+    def _compact_by_headways(self, trips):
+        """
+        Detect trips with the same stops and travel times, which depart in
+        a constant headway. Each run of at least headway_min_trips of them is
+        replaced by its first trip and a frequency with exact times, which
+        stands for all departures of the run.
+
+        :param trips: List of tuples of TripPattern object and start time
+        :return trips: List of tuples of TripPattern object, start time and
+            a tuple of end time and headway of its frequency, or None
+        """
+        # Group trips by their pattern of stops and travel times
+        patterns = OrderedDict()
+        compacted = []
+        for pattern, start_time in trips:
+            if pattern is None:
+                compacted.append((pattern, start_time, None))
+            else:
+                patterns.setdefault(pattern, []).append(start_time)
+
+        for pattern, start_times in patterns.iteritems():
+            start_times.sort()
+            i = 0
+            while i < len(start_times):
+                # Find the longest run of a constant headway
+                end = i + 1
+                if end < len(start_times):
+                    headway = start_times[end] - start_times[i]
+                    while (headway > 0 and end < len(start_times) and
+                           start_times[end] - start_times[end - 1] == headway):
+                        end += 1
+
+                if end - i >= self.headway_min_trips:
+                    compacted.append((pattern, start_times[i],
+                                      (start_times[end - 1] + headway, headway)))
+                    i = end
                 else:
-                    try:
-                        gtfs_trip.AddStopTime(gtfs_stop)
-                    except transitfeed.problems.OtherProblem:
-                        logging.warning(
-                            "Could not add first stop to trip without time information.")
-                        logging.warning(" %s - %s", itinerary_stop.name, itinerary_stop.osm_url)
-                        break
-
-                # Add reference to shape
-                gtfs_trip.shape_id = shape_id
-
-                # Add empty attributes to make navitia happy
-                gtfs_trip.block_id = ""
-                gtfs_trip.wheelchair_accessible = ""
-                gtfs_trip.bikes_allowed = ""
-                gtfs_trip.direction_id = ""
-
-            # Calculate all times of stops, which were added with no time
-            Helper.interpolate_stop_times(gtfs_trip)
-        return trips_count
+                    compacted.append((pattern, start_times[i], None))
+                    i += 1
+        return compacted
+
+    def _add_frequency_trip(self, feed, route, gtfs_stops, travel_time, headways,
+                            service_period=None):
+        """
+        Add a trip to the GTFS feed, which is served in regular intervals.
+
+        The stop times of the trip are a template for all departures: the
+        first stop is served at FREQUENCY_TRIP_START and the last stop after
+        the travel time. All stop times are calculated first and added at
+        once.
+
+        :param route: GTFS route object
+        :param gtfs_stops: List of GTFS stop objects served by the trip
+        :param travel_time: Minutes between the first and the last stop
+        :param headways: List of tuples of start time, end time and headway
+            (in seconds) for the frequencies of the trip
+        :return trip: GTFS trip object
+        """
+        trip = route.AddTrip(feed, service_period=service_period)
+
+        for start_time, end_time, headway in headways:
+            trip.AddFrequency(start_time, end_time, headway)
+
+        stop_times = self._get_frequency_stop_times(
+            gtfs_stops, self.FREQUENCY_TRIP_START, travel_time * 60)
+        for gtfs_stop, secs in zip(gtfs_stops, stop_times):
+            trip.AddStopTime(gtfs_stop, arrival_secs=secs, departure_secs=secs)
+        return trip
+
+    @staticmethod
+    def _get_frequency_stop_times(gtfs_stops, start_secs, travel_secs):
+        """
+        Calculate the stop times of a trip from its travel time. The times
+        of the stops in between are interpolated by their distance.
+
+        :return stop_times: List of seconds since midnight
+        """
+        if len(gtfs_stops) < 2:
+            return [start_secs] * len(gtfs_stops)
+
+        pattern = TripPattern(tuple(gtfs_stops),
+                              (0,) + (None,) * (len(gtfs_stops) - 2) + (travel_secs,))
+        return [time for _, time in pattern.get_stop_times(start_secs)]
 
     def _create_gtfs_service_period(self, feed, service):
         """
@@ -336,7 +547,7 @@ class TripsCreator(object):
         Load the part of the provided schedule that fits to a particular
         itinerary.
 
-        :return times: List of strings
+        :return times: List of lists of times, in seconds since midnight
         """
         times = []
         for trip in schedule['lines'][itinerary.route_id]:
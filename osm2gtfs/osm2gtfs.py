@@ -5,41 +5,57 @@ import os
 import sys
 import logging
 import argparse
-import transitfeed
-from core.configuration import Configuration
-from core.osm_connector import OsmConnector
-from core.creator_factory import CreatorFactory
-
-
-# Define logging level
-logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
-
-# Handle arguments
-parser = argparse.ArgumentParser(
-    prog='osm2gtfs', description='Create GTFS from OpenStreetMap data.')
-
-# Filename arguments for config and output file
-parser.add_argument('--config', '-c', metavar='FILE',
-                    type=argparse.FileType('r'), help='Configuration file')
-parser.add_argument('--output', '-o', metavar='FILENAME',
-                    type=str, help='Specify GTFS output zip file')
-
-# Refresh caching arguments
-group = parser.add_mutually_exclusive_group()
-group.add_argument('--refresh-routes', action="store_true",
-                   help='Refresh OSM data for all routes')
-group.add_argument('--refresh-stops', action="store_true",
-                   help='Refresh OSM data for all stops')
-group.add_argument('--refresh-osm', action="store_true",
-                   help='Refresh all OSM data')
-group.add_argument('--refresh-schedule-source', action="store_true",
-                   help='Refresh data for time information')
-group.add_argument('--refresh-all', action="store_true",
-                   help='Refresh all OSM and time information data')
-args = parser.parse_args()
-
-
-def main():
+
+
+def get_parser():
+    """Defines the command line arguments of osm2gtfs
+
+    :return parser: ArgumentParser object
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='osm2gtfs', description='Create GTFS from OpenStreetMap data.')
+
+    # Filename arguments for config and output file
+    parser.add_argument('--config', '-c', metavar='FILE',
+                        type=argparse.FileType('r'), help='Configuration file')
+    parser.add_argument('--output', '-o', metavar='FILENAME',
+                        type=str, help='Specify GTFS output zip file')
+    parser.add_argument('--report', metavar='FILENAME', type=str,
+                        help='Write issues found in the data to a JSON (or .jsonl) file')
+
+    # Refresh caching arguments
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--refresh-routes', action="store_true",
+                       help='Refresh OSM data for all routes')
+    group.add_argument('--refresh-changed-routes', action="store_true",
+                       help='Refresh OSM data only for routes changed since last refresh')
+    group.add_argument('--refresh-stops', action="store_true",
+                       help='Refresh OSM data for all stops')
+    group.add_argument('--refresh-osm', action="store_true",
+                       help='Refresh all OSM data')
+    group.add_argument('--refresh-schedule-source', action="store_true",
+                       help='Refresh data for time information')
+    group.add_argument('--refresh-all', action="store_true",
+                       help='Refresh all OSM and time information data')
+    return parser
+
+
+def main(argv=None):
+
+    # Handle arguments
+    args = get_parser().parse_args(argv)
+
+    # Define logging level
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
+
+    # Load heavy dependencies only when actually creating GTFS
+    import transitfeed
+    from core.configuration import Configuration
+    from core.osm_connector import OsmConnector
+    from core.creator_factory import CreatorFactory
+    from core.diagnostics import Diagnostics
+    from core.spooled_schedule import SpooledSchedule
 
     # Load, prepare and validate configuration
     config = Configuration(args)
@@ -50,20 +66,24 @@ def main():
     # Refresh argument option calls
     if args.refresh_routes:
         data.get_routes(refresh=True)
+    elif args.refresh_changed_routes:
+        data.refresh_changed_routes()
     elif args.refresh_stops:
         data.get_stops(refresh=True)
     elif args.refresh_osm:
-        data.get_routes(refresh=True)
-        data.get_stops(refresh=True)
+        data.refresh_routes_and_stops()
     elif args.refresh_schedule_source:
-        config.get_schedule_source(refresh=True)
+        config.refresh_schedule_source()
     elif args.refresh_all:
-        data.get_routes(refresh=True)
-        data.get_stops(refresh=True)
-        config.get_schedule_source(refresh=True)
+        data.refresh_routes_and_stops()
+        config.refresh_schedule_source()
 
-    # Define (transitfeed) object for GTFS creation
-    feed = transitfeed.Schedule()
+    # Define (transitfeed) object for GTFS creation. Large feeds keep their
+    # stop times on the hard drive, if a buffer size is set in the config file
+    if 'stop_times_buffer_size' in config.data:
+        feed = SpooledSchedule(int(config.data['stop_times_buffer_size']))
+    else:
+        feed = transitfeed.Schedule()
 
     # Initiate creators for GTFS components through an object factory
     factory = CreatorFactory(config)
@@ -92,6 +112,11 @@ def main():
     # Write GTFS
     feed.WriteGoogleTransitFeed(config.output)
 
+    # Summarize issues found in the data
+    Diagnostics.log_summary()
+    if args.report:
+        Diagnostics.write_report(args.report)
+
     sys.exit()
 
 
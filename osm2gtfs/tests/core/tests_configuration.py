@@ -0,0 +1,112 @@
+# coding=utf-8
+
+import unittest
+import os
+import json
+import threading
+from StringIO import StringIO
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from mock import patch
+from osm2gtfs.core.configuration import Configuration
+from osm2gtfs.core.cache import Cache
+
+
+class CoreTestsScheduleHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for a server providing a schedule file with an ETag
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        etag = '"%s"' % len(self.server.schedule)
+        self.server.statuses.append(
+            304 if self.headers.get("If-None-Match") == etag else 200)
+        self.send_response(self.server.statuses[-1])
+        self.send_header("ETag", etag)
+        if self.server.statuses[-1] == 200:
+            self.send_header("Content-Length", str(len(self.server.schedule)))
+            self.end_headers()
+            self.wfile.write(self.server.schedule)
+        else:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, *args):
+        # pylint: disable=arguments-differ
+        pass
+
+
+class CoreTestsArgs(object):
+    def __init__(self, config):
+        """
+        Prepare arguments for the Initialization of an Configuration object
+        """
+        self.config = StringIO(json.dumps(config))
+        self.output = "tests_core.zip"
+
+
+class TestCoreConfiguration(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), CoreTestsScheduleHandler)
+        self.server.schedule = '{"lines": {}}'
+        self.server.statuses = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.selector = "tests_core_schedule"
+        self.config = {
+            'selector': self.selector,
+            'feed_info': {'start_date': "20180101", 'end_date': "20181231"},
+            'schedule_source': "http://127.0.0.1:%s/schedule.json" % self.server.server_port,
+        }
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for filename in [self.selector + "-schedule", self.selector + "-schedule-validators.pkl"]:
+            if os.path.isfile(os.path.join("data", filename)):
+                os.remove(os.path.join("data", filename))
+
+    def test_conditional_schedule_download(self):
+        config = Configuration(CoreTestsArgs(self.config))
+        self.assertEqual(config.get_schedule_source(refresh=True), '{"lines": {}}')
+        source_hash = config.get_schedule_source_hash()
+
+        # Unchanged schedule isn't transferred again
+        config = Configuration(CoreTestsArgs(self.config))
+        self.assertEqual(config.get_schedule_source(refresh=True), '{"lines": {}}')
+        self.assertEqual(self.server.statuses, [200, 304])
+        self.assertEqual(config.get_schedule_source_hash(), source_hash)
+
+        # The cached schedule isn't read into memory to be refreshed
+        config = Configuration(CoreTestsArgs(self.config))
+        with patch.object(Cache, "read_file") as read_file:
+            config.refresh_schedule_source()
+        self.assertFalse(read_file.called)
+        self.assertEqual(self.server.statuses, [200, 304, 304])
+        with config.open_schedule_source() as schedule_source_file:
+            self.assertEqual(schedule_source_file.read(), '{"lines": {}}')
+
+        # Downloads use the rate limit and retries of the queries
+        config = Configuration(CoreTestsArgs(dict(self.config, query={'max_retries': 1})))
+        self.assertEqual(config.http_client.max_retries, 1)
+
+        # Changed schedule
+        self.server.schedule = '{"lines": {"1": []}}'
+        config = Configuration(CoreTestsArgs(self.config))
+        self.assertEqual(config.get_schedule_source(refresh=True), '{"lines": {"1": []}}')
+        self.assertEqual(self.server.statuses, [200, 304, 304, 200])
+        self.assertNotEqual(config.get_schedule_source_hash(), source_hash)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_conditional_schedule_download']
+    suite = unittest.TestSuite(map(TestCoreConfiguration, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
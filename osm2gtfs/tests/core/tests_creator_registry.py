@@ -0,0 +1,85 @@
+# coding=utf-8
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import importlib
+import pkg_resources
+from mock import patch, Mock
+from osm2gtfs.core.creator_registry import CreatorRegistry
+from osm2gtfs.creators.agency_creator import AgencyCreator
+from osm2gtfs.creators.gh_accra.trips_creator_gh_accra import TripsCreatorGhAccra
+
+
+class TestCoreCreatorRegistry(unittest.TestCase):
+
+    def setUp(self):
+        # Provide an out-of-tree creator package
+        self.path = tempfile.mkdtemp()
+        package_path = os.path.join(self.path, "xx_plugin")
+        os.mkdir(package_path)
+        open(os.path.join(package_path, "__init__.py"), "w").close()
+        with open(os.path.join(package_path, "routes_creator_xx_plugin.py"), "w") as f:
+            f.write("class RoutesCreatorXxPlugin(object):\n    pass\n")
+        sys.path.insert(0, self.path)
+
+        entry_point = Mock()
+        entry_point.module_name = "xx_plugin"
+        entry_point.load = lambda: importlib.import_module("xx_plugin")
+        self.entry_points = {"xx_plugin": [entry_point]}
+
+    def tearDown(self):
+        sys.path.remove(self.path)
+        shutil.rmtree(self.path)
+        for module in list(sys.modules):
+            if module.startswith("xx_plugin"):
+                del sys.modules[module]
+        CreatorRegistry._creators.pop("xx_plugin", None)  # pylint: disable=protected-access
+
+    def _iter_entry_points(self, group, name):
+        self.assertEqual(group, CreatorRegistry.ENTRY_POINT_GROUP)
+        return self.entry_points.get(name, [])
+
+    def test_in_tree_creators(self):
+        creators = CreatorRegistry.get_creators("gh_accra")
+        self.assertEqual(sorted(creators), ['routes', 'schedule', 'stops', 'trips'])
+        self.assertIs(creators, CreatorRegistry.get_creators("gh_accra"),
+                      "Resolved creators weren't cached")
+
+        self.assertEqual(CreatorRegistry.get_creator_class("trips", "gh_accra"),
+                         (TripsCreatorGhAccra, False))
+        self.assertEqual(CreatorRegistry.get_creator_class("agency", "gh_accra"),
+                         (AgencyCreator, True))
+
+        # Selectors without own creators
+        self.assertEqual(CreatorRegistry.get_creators("cr_gam"), {})
+        self.assertEqual(CreatorRegistry.get_creator_class("agency", None),
+                         (AgencyCreator, True))
+
+    def test_entry_point_creators(self):
+        with patch.object(pkg_resources, "iter_entry_points", self._iter_entry_points):
+            creator_class, is_default = CreatorRegistry.get_creator_class(
+                "routes", "xx_plugin")
+        self.assertEqual(creator_class.__name__, "RoutesCreatorXxPlugin")
+        self.assertFalse(is_default)
+
+    def test_import_errors_are_raised(self):
+        # A creator with a missing dependency
+        with open(os.path.join(self.path, "xx_plugin", "trips_creator_xx_plugin.py"), "w") as f:
+            f.write("import osm2gtfs_missing_dependency\n")
+        with patch.object(pkg_resources, "iter_entry_points", self._iter_entry_points):
+            self.assertRaises(ImportError, CreatorRegistry.get_creators, "xx_plugin")
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_in_tree_creators', 'test_entry_point_creators',
+                  'test_import_errors_are_raised']
+    suite = unittest.TestSuite(map(TestCoreCreatorRegistry, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
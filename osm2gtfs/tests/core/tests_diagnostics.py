@@ -0,0 +1,70 @@
+# coding=utf-8
+
+import unittest
+import os
+import json
+import tempfile
+from osm2gtfs.core.diagnostics import Diagnostics
+from osm2gtfs.core.elements import Stop
+
+
+class TestCoreDiagnostics(unittest.TestCase):
+
+    def setUp(self):
+        Diagnostics.reset()
+
+    def tearDown(self):
+        Diagnostics.reset()
+
+    def test_stop_in_two_stop_areas(self):
+        stop = Stop(osm_id=1, osm_type="node", osm_url="https://osm.org/node/1",
+                    tags={}, name="Stop", lat=0.0, lon=0.0)
+        stop.set_parent_station("relation/10")
+        self.assertEqual(Diagnostics.get_count(Diagnostics.STOP_IN_TWO_STOP_AREAS), 0)
+
+        stop.set_parent_station("relation/11")
+        self.assertEqual(Diagnostics.get_count(Diagnostics.STOP_IN_TWO_STOP_AREAS), 1)
+        self.assertEqual(stop.get_parent_station(), "relation/10")
+
+    def test_write_report(self):
+        Diagnostics.add(Diagnostics.MISSING_REF, "relation", 1)
+        Diagnostics.add(Diagnostics.NON_MATCHING_WAYS, "relation", 2, 20)
+        Diagnostics.add(Diagnostics.MISSING_REF, "relation", 3)
+
+        handle, filename = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        try:
+            Diagnostics.write_report(filename)
+            with open(filename) as report_file:
+                issues = [json.loads(line) for line in report_file]
+        finally:
+            os.remove(filename)
+
+        self.assertEqual(len(issues), 3)
+        self.assertEqual(issues[1], {'issue': Diagnostics.NON_MATCHING_WAYS,
+                                     'osm_url': "https://osm.org/relation/2",
+                                     'detail': 20})
+
+        handle, filename = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        try:
+            Diagnostics.write_report(filename)
+            with open(filename) as report_file:
+                report = json.load(report_file)
+        finally:
+            os.remove(filename)
+
+        self.assertEqual(report['counts'], {Diagnostics.MISSING_REF: 2,
+                                            Diagnostics.NON_MATCHING_WAYS: 1})
+        self.assertEqual(len(report['issues']), 3)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_stop_in_two_stop_areas', 'test_write_report']
+    suite = unittest.TestSuite(map(TestCoreDiagnostics, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
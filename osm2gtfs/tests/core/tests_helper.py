@@ -0,0 +1,61 @@
+# coding=utf-8
+
+import unittest
+from osm2gtfs.core.helper import Helper
+
+
+class TestCoreHelper(unittest.TestCase):
+
+    def _get_straight_shape(self):
+        # Almost straight line of points, about 111 meters apart
+        return [{'lat': 0.0, 'lon': 0.001 * i + (0.000001 if i % 2 else 0.0)}
+                for i in range(11)]
+
+    def test_simplify_shape(self):
+        shape = self._get_straight_shape()
+
+        simplified = Helper.simplify_shape(shape, 1.0)
+        self.assertEqual(simplified, [shape[0], shape[-1]],
+                         "Straight shape wasn't reduced to its end points")
+
+        # The corner of a shape needs to be kept
+        for i in range(6, 11):
+            shape[i] = {'lat': 0.001 * (i - 5), 'lon': 0.005}
+        simplified = Helper.simplify_shape(shape, 1.0)
+        self.assertEqual(simplified, [shape[0], shape[5], shape[-1]],
+                         "Relevant shape point was removed")
+
+    def test_simplify_shape_keeps_anchors(self):
+        shape = self._get_straight_shape()
+
+        simplified = Helper.simplify_shape(shape, 1.0, anchors=[(0.0001, 0.0031)])
+        self.assertEqual(simplified, [shape[0], shape[3], shape[-1]],
+                         "Shape point closest to a stop was removed")
+
+    def test_simplify_shape_without_tolerance(self):
+        shape = self._get_straight_shape()
+
+        self.assertEqual(Helper.simplify_shape(shape, 0), shape,
+                         "Shape was simplified without a tolerance")
+
+    def test_get_seconds_since_midnight(self):
+        self.assertEqual(Helper.get_seconds_since_midnight("05:30"), 19800)
+        self.assertEqual(Helper.get_seconds_since_midnight("5:30:15"), 19815)
+
+        # Times after midnight of the following day
+        self.assertEqual(Helper.get_seconds_since_midnight("25:10"), 90600)
+
+        for time in ["5", "05:60", "05:30:00:00", "ab:cd", ""]:
+            self.assertRaises(ValueError, Helper.get_seconds_since_midnight, time)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_simplify_shape', 'test_simplify_shape_keeps_anchors',
+                  'test_simplify_shape_without_tolerance', 'test_get_seconds_since_midnight']
+    suite = unittest.TestSuite(map(TestCoreHelper, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+# coding=utf-8
+
+import unittest
+import gzip
+import time
+import socket
+import threading
+from StringIO import StringIO
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from osm2gtfs.core.http_client import HttpClient
+
+
+class CoreTestsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for an HTTP server, which keeps connections alive. Requests to
+    "/busy" are answered with 429 Too Many Requests, until the second retry.
+    Requests to "/redirect" and "/see-other" are redirected to "/content",
+    requests to "/loop" to themselves. After "/drop", the connection is
+    closed without notice, "/slow" is answered after half a second.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path, self.client_address))
+        if self.path == "/busy" and len(self.server.requests) < 3:
+            self._respond(429, "Busy")
+        elif self.path == "/redirect":
+            self._respond(302, "", {"Location": "/content"})
+        elif self.path == "/see-other":
+            location = "http://%s:%s/content" % self.server.server_address
+            self._respond(303, "", {"Location": location})
+        elif self.path == "/loop":
+            self._respond(307, "", {"Location": "/loop"})
+        elif self.path == "/drop":
+            self._respond(200, "Content")
+            self.close_connection = 1  # pylint: disable=attribute-defined-outside-init
+        elif self.path == "/slow":
+            time.sleep(0.5)
+            self._respond(200, "Content")
+        elif "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = StringIO()
+            with gzip.GzipFile(fileobj=body, mode="wb") as gzip_file:
+                gzip_file.write("Content")
+            self._respond(200, body.getvalue(), {"Content-Encoding": "gzip"})
+        else:
+            self._respond(200, "Content")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.do_GET()
+
+    def _respond(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        # pylint: disable=arguments-differ
+        pass
+
+
+class TestCoreHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), CoreTestsRequestHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:%s" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive_and_gzip(self):
+        client = HttpClient()
+        for _ in range(3):
+            response = client.get(self.url + "/content")
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.body, "Content")
+        client.close()
+
+        # All requests were sent over the same connection
+        self.assertEqual(len(set(address for _, _, address in self.server.requests)), 1)
+
+    def test_retry(self):
+        client = HttpClient(backoff=0.01)
+        response = client.get(self.url + "/busy")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(self.server.requests), 3)
+
+        # Give up after the maximal amount of retries
+        del self.server.requests[:]
+        client = HttpClient(backoff=0.01, max_retries=1)
+        response = client.get(self.url + "/busy")
+        self.assertEqual(response.status, 429)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_redirect(self):
+        client = HttpClient()
+        response = client.get(self.url + "/redirect")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.body, "Content")
+        self.assertEqual([(method, path) for method, path, _ in self.server.requests],
+                         [("GET", "/redirect"), ("GET", "/content")])
+
+        # Requests redirected by "303 See Other" are continued with GET
+        del self.server.requests[:]
+        response = client.post(self.url + "/see-other", "data")
+        self.assertEqual(response.status, 200)
+        self.assertEqual([(method, path) for method, path, _ in self.server.requests],
+                         [("POST", "/see-other"), ("GET", "/content")])
+
+        # Redirects are followed a limited amount of times
+        del self.server.requests[:]
+        response = client.get(self.url + "/loop")
+        self.assertEqual(response.status, 307)
+        self.assertEqual(len(self.server.requests), HttpClient.MAX_REDIRECTS + 1)
+
+    def test_reconnect(self):
+        client = HttpClient()
+        client.get(self.url + "/drop")
+
+        # The idle connection closed by the server is replaced by a new one
+        response = client.get(self.url + "/content")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(set(address for _, _, address in self.server.requests)), 2)
+
+    def test_timeout(self):
+        # Requests which timed out are not sent again
+        client = HttpClient(timeout=0.1)
+        self.assertRaises(socket.timeout, client.get, self.url + "/slow")
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_rate_limit(self):
+        client = HttpClient(rate=20, burst=1)
+        start = time.time()
+        for _ in range(5):
+            client.get(self.url + "/content")
+        self.assertGreaterEqual(time.time() - start, 0.19)
+
+    def test_from_config(self):
+        client = HttpClient.from_config({})
+        self.assertEqual(client.timeout, HttpClient.OVERPASS_TIMEOUT + HttpClient.TIMEOUT_MARGIN)
+        self.assertEqual(client.max_retries, 3)
+
+        client = HttpClient.from_config(
+            {'rate_limit': 2, 'max_retries': 1, 'tiles': {'timeout': 600}})
+        self.assertEqual(client.timeout, 600 + HttpClient.TIMEOUT_MARGIN)
+        self.assertEqual(client.max_retries, 1)
+        self.assertEqual(client._bucket.rate, 2)  # pylint: disable=protected-access
+
+    def test_invalid_url(self):
+        self.assertRaises(ValueError, HttpClient().get, "no/url")
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_keep_alive_and_gzip', 'test_retry', 'test_redirect', 'test_reconnect',
+                  'test_timeout', 'test_rate_limit', 'test_from_config', 'test_invalid_url']
+    suite = unittest.TestSuite(map(TestCoreHttpClient, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
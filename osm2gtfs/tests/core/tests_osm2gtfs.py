@@ -0,0 +1,51 @@
+# coding=utf-8
+
+import unittest
+import subprocess
+import sys
+
+
+class TestCoreOsm2gtfs(unittest.TestCase):
+
+    @staticmethod
+    def _run_python(code):
+        """
+        Runs code in a fresh interpreter, to not depend on modules already
+        imported by other tests.
+        """
+        process = subprocess.Popen(
+            [sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, _ = process.communicate()
+        return process.returncode, output.strip()
+
+    def test_import_is_lightweight(self):
+        returncode, output = self._run_python(
+            "import sys\n"
+            "sys.argv = ['program', '--unknown-argument']\n"
+            "import osm2gtfs.osm2gtfs\n"
+            "print('transitfeed' in sys.modules, 'overpy' in sys.modules)\n")
+        self.assertEqual(returncode, 0, "Importing consumed the arguments of the program")
+        self.assertEqual(output, "(False, False)", "Importing loaded heavy dependencies")
+
+    def test_help_is_lightweight(self):
+        returncode, output = self._run_python(
+            "import sys\n"
+            "from osm2gtfs.osm2gtfs import main\n"
+            "try:\n"
+            "    main(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "print('transitfeed' in sys.modules)\n")
+        self.assertEqual(returncode, 0)
+        self.assertTrue(output.endswith("False"), "Printing help loaded heavy dependencies")
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_import_is_lightweight', 'test_help_is_lightweight']
+    suite = unittest.TestSuite(map(TestCoreOsm2gtfs, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,275 @@
+# coding=utf-8
+
+import unittest
+import json
+import socket
+import overpy
+from mock import patch
+from osm2gtfs.core.osm_connector import OsmConnector
+from osm2gtfs.core.http_client import HttpClient
+from osm2gtfs.core.elements import Line, Itinerary, Stop
+
+
+class CoreTestsConfig(object):
+    def __init__(self, data):
+        """
+        Minimal replacement of a Configuration object
+        (see osm2gtfs.core.configuration for more information)
+
+        """
+        self.data = data
+
+
+class TestCoreOsmConnector(unittest.TestCase):
+
+    def setUp(self):
+        self.config = CoreTestsConfig({
+            'query': {'bbox': {'n': "1", 's': "0", 'e': "1", 'w': "0"}},
+            'selector': 'tests_core',
+        })
+
+    @staticmethod
+    def _get_result(ways, members, inline_geometry=False):
+        """
+        Creates an Overpass result of nodes placed on a line, ways between them
+        and a route relation with the ways as members. With inline geometry,
+        the nodes are only part of the ways, like with "out geom".
+        """
+        elements = []
+        node_ids = set(node for nodes in ways.values() for node in nodes)
+        if not inline_geometry:
+            for node in node_ids:
+                elements.append({'type': 'node', 'id': node, 'lat': 0.0, 'lon': node * 0.001})
+        for way, nodes in ways.items():
+            elements.append({'type': 'way', 'id': way, 'nodes': nodes})
+            if inline_geometry:
+                elements[-1]['geometry'] = [{'lat': 0.0, 'lon': node * 0.001} for node in nodes]
+        elements.append({
+            'type': 'relation', 'id': 1, 'tags': {'type': 'route'},
+            'members': [{'type': 'way', 'ref': way, 'role': ''} for way in members]})
+        return overpy.Overpass().parse_json(json.dumps({'elements': elements}))
+
+    def _get_shape_nodes(self, result):
+        data = OsmConnector(self.config)
+        # pylint: disable=protected-access
+        shape = data._generate_shape(result.get_relations(1)[0], result)
+        return [int(round(point['lon'] / 0.001)) for point in shape]
+
+    def test_generate_shape(self):
+        result = self._get_result(
+            {10: [1, 2, 3], 11: [4, 3], 12: [4, 5]}, [10, 11, 12])
+        self.assertEqual(self._get_shape_nodes(result), [1, 2, 3, 4, 5])
+
+    def test_generate_shape_out_of_order(self):
+        result = self._get_result(
+            {10: [1, 2], 11: [3, 4], 12: [2, 3], 13: [4, 5]}, [10, 11, 12, 13])
+        self.assertEqual(self._get_shape_nodes(result), [1, 2, 3, 4, 5])
+
+    def test_generate_shape_roundabout(self):
+        result = self._get_result(
+            {10: [1, 2], 11: [3, 4, 5, 6, 3], 12: [2, 3], 13: [5, 7]}, [10, 12, 11, 13])
+        self.assertEqual(self._get_shape_nodes(result), [1, 2, 3, 4, 5, 7])
+
+    def test_generate_shape_with_gap(self):
+        result = self._get_result({10: [1, 2], 11: [3, 4]}, [10, 11])
+        self.assertEqual(self._get_shape_nodes(result), [1, 2])
+
+        # Nodes are about 111 meters apart
+        self.config.data['shapes'] = {'max_gap': 200}
+        self.assertEqual(self._get_shape_nodes(result), [1, 2, 3, 4])
+
+    def test_generate_shape_from_inline_geometry(self):
+        result = self._get_result(
+            {10: [1, 2], 11: [3, 4], 12: [2, 3], 13: [4, 5]}, [10, 11, 12, 13],
+            inline_geometry=True)
+        self.assertEqual(self._get_shape_nodes(result), [1, 2, 3, 4, 5])
+
+    def test_build_stop_from_center(self):
+        elements = [{'type': 'way', 'id': 10, 'nodes': [1, 2, 3, 1],
+                     'center': {'lat': 0.5, 'lon': 0.25},
+                     'tags': {'public_transport': 'platform', 'name': "Stop"}}]
+        result = overpy.Overpass().parse_json(json.dumps({'elements': elements}))
+
+        # pylint: disable=protected-access
+        stop = OsmConnector(self.config)._build_stop(result.get_way(10), "way")
+        self.assertEqual((float(stop.lat), float(stop.lon)), (0.5, 0.25))
+
+    def test_get_routes_to_rebuild(self):
+        # Route master 100 with variants 1 and 2, standalone variant 3
+        elements = [
+            {'type': 'relation', 'id': 100, 'tags': {'type': 'route_master'},
+             'members': [{'type': 'relation', 'ref': 1, 'role': ''},
+                         {'type': 'relation', 'ref': 2, 'role': ''}]}]
+        for relation_id in [1, 2, 3]:
+            elements.append({'type': 'relation', 'id': relation_id,
+                             'tags': {'type': 'route'}, 'members': []})
+        result = overpy.Overpass().parse_json(json.dumps({'elements': elements}))
+        relations = dict((relation.id, relation) for relation in result.relations)
+
+        routes = {}
+        for line_id, variants in [(100, [1, 2]), (3, [3])]:
+            line = Line(osm_id=line_id, osm_type="relation", osm_url="", tags={},
+                        name="", route_id=str(line_id))
+            for variant in variants:
+                line.add_itinerary(Itinerary(
+                    osm_id=variant, osm_type="relation", osm_url="", tags={},
+                    name="", route_id=str(line_id), shape=[]))
+            routes[str(line_id)] = line
+
+        # pylint: disable=protected-access
+        rebuild, outdated = OsmConnector._get_routes_to_rebuild(set([2]), relations, routes)
+        self.assertEqual(rebuild, set([1, 2, 100]))
+        self.assertEqual(outdated, set(["100"]))
+
+        # Variant 3 was deleted in OpenStreetMap
+        del relations[3]
+        rebuild, outdated = OsmConnector._get_routes_to_rebuild(set([3]), relations, routes)
+        self.assertEqual(rebuild, set([3]))
+        self.assertEqual(outdated, set(["3"]))
+
+    def test_split_routes_and_stops(self):
+        elements = [
+            {'type': 'node', 'id': 1, 'lat': 0.0, 'lon': 0.001},
+            {'type': 'node', 'id': 2, 'lat': 0.0, 'lon': 0.002},
+            {'type': 'node', 'id': 3, 'lat': 0.0001, 'lon': 0.001,
+             'tags': {'public_transport': 'platform'}},
+            {'type': 'node', 'id': 4, 'lat': 0.0001, 'lon': 0.002},
+            {'type': 'node', 'id': 5, 'lat': 0.0002, 'lon': 0.002},
+            {'type': 'way', 'id': 10, 'nodes': [1, 2]},
+            {'type': 'way', 'id': 11, 'nodes': [4, 5],
+             'tags': {'public_transport': 'platform'}},
+            {'type': 'relation', 'id': 20, 'tags': {'type': 'route'},
+             'members': [{'type': 'node', 'ref': 3, 'role': 'platform'},
+                         {'type': 'way', 'ref': 11, 'role': 'platform'},
+                         {'type': 'way', 'ref': 10, 'role': ''}]},
+            {'type': 'relation', 'id': 30, 'tags': {
+                'type': 'public_transport', 'public_transport': 'stop_area'},
+             'members': [{'type': 'node', 'ref': 3, 'role': 'platform'}]},
+        ]
+        result = overpy.Overpass().parse_json(json.dumps({'elements': elements}))
+
+        # pylint: disable=protected-access
+        routes, stops = OsmConnector._split_routes_and_stops(result)
+        self.assertEqual(routes.get_relation_ids(), [20])
+        self.assertEqual(sorted(routes.get_way_ids()), [10, 11])
+        self.assertEqual(sorted(stops.get_relation_ids()), [30])
+        self.assertEqual(stops.get_way_ids(), [11])
+        self.assertEqual(sorted(stops.get_node_ids()), [3, 4, 5])
+
+    def test_query_stop_areas(self):
+        data = OsmConnector(self.config)
+        empty_result = overpy.Result()
+        with patch.object(OsmConnector, "_query", return_value=empty_result) as query:
+            # pylint: disable=protected-access
+            data._query_stops(data.bbox)
+            data._query_routes_and_stops(data.bbox)
+
+        # Stop areas of node and way platforms get selected at once
+        for call in query.call_args_list:
+            query_str = call[0][0]
+            self.assertNotIn("foreach", query_str)
+            self.assertIn("rel(bn.", query_str)
+            self.assertIn("rel(bw.", query_str)
+
+    def test_query_by_tiles(self):
+        queried_bboxes = []
+
+        def query_function(bbox):
+            """
+            Fails for tiles larger than a quarter of the bbox. Returns a
+            route relation and a node per tile.
+            """
+            queried_bboxes.append(bbox)
+            south, west, north, east = [float(value) for value in bbox.split(",")]
+            if north - south > 0.25:
+                raise overpy.exception.OverpassGatewayTimeout()
+            elements = [{'type': 'relation', 'id': 1, 'tags': {'type': 'route'},
+                         'members': []},
+                        {'type': 'node', 'id': int(south * 100) * 1000 + int(west * 100),
+                         'lat': south, 'lon': west}]
+            return overpy.Overpass().parse_json(json.dumps({'elements': elements}))
+
+        # Without tiles, the bbox gets queried at once
+        data = OsmConnector(self.config)
+        self.assertRaises(overpy.exception.OverpassGatewayTimeout,
+                          data._query_by_tiles, query_function)  # pylint: disable=protected-access
+        self.assertEqual(queried_bboxes, ["0,0,1,1"])
+
+        # Tiles of depth 1 fail and get split again
+        del queried_bboxes[:]
+        self.config.data['query']['tiles'] = {'workers': 2}
+        data = OsmConnector(self.config)
+        result = data._query_by_tiles(query_function)  # pylint: disable=protected-access
+        self.assertEqual(len(queried_bboxes), 4 + 16)
+        self.assertEqual(len(result.get_relation_ids()), 1)
+        self.assertEqual(len(result.get_node_ids()), 16)
+
+        # Tiles can't be split up endlessly
+        self.config.data['query']['tiles'] = {'workers': 2, 'max_depth': 1}
+        data = OsmConnector(self.config)
+        self.assertRaises(overpy.exception.OverpassGatewayTimeout,
+                          data._query_by_tiles, query_function)  # pylint: disable=protected-access
+
+    def test_query_tile_client_timeout(self):
+        queried_bboxes = []
+
+        def query_function(bbox):
+            queried_bboxes.append(bbox)
+            south, _, north, _ = [float(value) for value in bbox.split(",")]
+            if north - south > 0.25:
+                raise socket.timeout("timed out")
+            return overpy.Result()
+
+        # Tiles, which time out on the client side, get split, too
+        self.config.data['query']['tiles'] = {'workers': 1, 'timeout': 600}
+        data = OsmConnector(self.config)
+        self.assertEqual(data.http_client.timeout, 600 + HttpClient.TIMEOUT_MARGIN)
+        # pylint: disable=protected-access
+        tile, result = data._query_tile(query_function, (0.0, 0.0, 0.5, 0.5))
+        self.assertEqual(tile, (0.0, 0.0, 0.5, 0.5))
+        self.assertIsInstance(result, socket.timeout)
+        del queried_bboxes[:]
+        self.assertIsNotNone(data._query_by_tiles(query_function))
+        self.assertEqual(len(queried_bboxes), 4 + 16)
+
+    def test_find_best_name_for_unnamed_stop(self):
+        # A named node nearby, which is also part of a named way closer to
+        # the stop, and further nodes of that way printed as skeleton
+        elements = [
+            {'type': 'node', 'id': 1, 'lat': 0.0, 'lon': 0.003, 'tags': {'name': "Market"}},
+            {'type': 'way', 'id': 10, 'nodes': [1, 2, 3], 'tags': {'name': "Main Street"}},
+            {'type': 'node', 'id': 1, 'lat': 0.0, 'lon': 0.003},
+            {'type': 'node', 'id': 2, 'lat': 0.0, 'lon': 0.0},
+            {'type': 'node', 'id': 3, 'lat': 0.0, 'lon': -0.003},
+        ]
+        result = overpy.Overpass().parse_json(json.dumps({'elements': elements}))
+        stop = Stop(osm_id=100, osm_type="node", osm_url="", tags={}, name="[Stop]",
+                    lat=0.0, lon=0.0)
+
+        data = OsmConnector(self.config)
+        with patch.object(OsmConnector, "_query", return_value=result) as query, \
+                patch.object(overpy.Overpass, "query") as overpass_query:
+            data._find_best_name_for_unnamed_stop(stop)  # pylint: disable=protected-access
+        self.assertEqual(stop.name, "Main Street")
+        self.assertEqual(result.get_node(1).tags, {'name': "Market"})
+
+        # The nodes of the ways are queried at once through the HTTP client
+        self.assertEqual(query.call_count, 1)
+        self.assertIn('type="way-node"', query.call_args[0][0])
+        self.assertFalse(overpass_query.called)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_generate_shape', 'test_generate_shape_out_of_order',
+                  'test_generate_shape_roundabout', 'test_generate_shape_with_gap',
+                  'test_generate_shape_from_inline_geometry', 'test_build_stop_from_center',
+                  'test_get_routes_to_rebuild', 'test_split_routes_and_stops',
+                  'test_query_stop_areas', 'test_query_by_tiles',
+                  'test_query_tile_client_timeout', 'test_find_best_name_for_unnamed_stop']
+    suite = unittest.TestSuite(map(TestCoreOsmConnector, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# coding=utf-8
+
+import unittest
+import os
+import json
+import tempfile
+from mock import patch
+from osm2gtfs.core.configuration import Configuration
+from osm2gtfs.creators.schedule_creator import ScheduleCreator
+from osm2gtfs.tests.core.tests_configuration import CoreTestsArgs
+
+
+class CoreTestsData(object):
+    """
+    Stand-in for the data object, the schedule gets added to
+    """
+    schedule = {}
+
+
+class TestCoreScheduleCreator(unittest.TestCase):
+
+    def setUp(self):
+        self.selector = "tests_core_schedule"
+        handle, self.source_file = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self._write_schedule(["05:00", "06:00"])
+
+    def tearDown(self):
+        os.remove(self.source_file)
+        for filename in [self.selector + "-schedule", self.selector + "-schedule-compiled.pkl"]:
+            if os.path.isfile(os.path.join("data", filename)):
+                os.remove(os.path.join("data", filename))
+
+    def _write_schedule(self, times):
+        trip = {"from": "A", "to": "B", "services": ["Mo-Fr"],
+                "stations": ["A", "B"], "times": [times]}
+        with open(self.source_file, "w") as f:
+            json.dump({"lines": {"1": [trip, dict(trip, services=["Sa"])]}}, f)
+
+    def _add_schedule(self, refresh=False):
+        config = Configuration(CoreTestsArgs({
+            'selector': self.selector,
+            'feed_info': {'start_date': "20180101", 'end_date': "20181231"},
+            'schedule_source': self.source_file,
+        }))
+        if refresh:
+            config.refresh_schedule_source()
+        data = CoreTestsData()
+        ScheduleCreator(config).add_schedule_to_data(data)
+        return data.schedule
+
+    def test_compiled_schedule(self):
+        schedule = self._add_schedule(refresh=True)
+        trips = schedule['lines']['1']
+        self.assertEqual(trips[0]['times'], [[18000, 21600]])
+
+        # Names are shared between trips
+        self.assertIs(trips[0]['stations'][0], trips[1]['stations'][0])
+
+        # The compiled schedule is used, while the schedule source is unchanged
+        with patch.object(ScheduleCreator, '_load_schedule_source',
+                          return_value={'lines': {}}) as load:
+            self.assertEqual(self._add_schedule(), schedule)
+            self.assertFalse(load.called)
+
+            with patch.object(ScheduleCreator, 'VERSION', ScheduleCreator.VERSION + 1):
+                self._add_schedule()
+            self.assertTrue(load.called)
+
+        # A changed schedule source is compiled again
+        self._write_schedule(["07:00", "08:00"])
+        schedule = self._add_schedule(refresh=True)
+        self.assertEqual(schedule['lines']['1'][0]['times'], [[25200, 28800]])
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_compiled_schedule']
+    suite = unittest.TestSuite(map(TestCoreScheduleCreator, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# coding=utf-8
+
+import unittest
+import json
+from StringIO import StringIO
+from osm2gtfs.core.schedule_reader import ScheduleReader
+
+
+class TestCoreScheduleReader(unittest.TestCase):
+
+    def setUp(self):
+        self.schedule = {
+            u"start_date": u"20180101",
+            u"lines": {
+                u"1": [
+                    {u"from": u"Estação", u"to": u"B", u"via": None,
+                     u"services": [u"Mo-Fr"], u"stations": [u"Estação", u"B"],
+                     u"times": [[u"05:00", u"05:30"], [u"06:00", u"06:30"]]},
+                    {u"from": u"B", u"to": u"Estação", u"services": [u"Sa"],
+                     u"stations": [u"B", u"Estação"], u"times": [[u"07:00", u"07:30"]]},
+                ],
+                u"2": [],
+                u"3": {u"empty": True},
+            },
+            u"numbers": [1, 12345, -1.5e3],
+        }
+        self.source = json.dumps(self.schedule, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def test_read(self):
+        # Small chunks split values and multi byte characters
+        for chunk_size in [1, 3, 7, 65536]:
+            reader = ScheduleReader(StringIO(self.source), chunk_size)
+            self.assertEqual(reader.read(), self.schedule)
+
+        # Other top level values are read as a whole
+        reader = ScheduleReader(StringIO(' [1, 2]'))
+        self.assertEqual(reader.read(), [1, 2])
+
+    def test_split_numbers(self):
+        # Numbers split at any position by the chunks are decoded completely
+        source = ('{"lines": {"1": [{"a": 12.5, "b": "x", "c": -1.25e+3}]}, '
+                  '"v": 100000.0, "w": 2E-2, "x": [7, 1e5 ]}')
+        for chunk_size in range(1, len(source) + 1):
+            reader = ScheduleReader(StringIO(source), chunk_size)
+            self.assertEqual(reader.read(), json.loads(source))
+
+    def test_prepare_trip(self):
+        prepared = []
+
+        def prepare_trip(route_id, trip):
+            prepared.append((route_id, trip[u"from"]))
+            return trip[u"from"]
+
+        schedule = ScheduleReader(StringIO(self.source), 5).read(prepare_trip)
+        self.assertEqual(sorted(prepared), [(u"1", u"B"), (u"1", u"Estação")])
+        self.assertEqual(schedule[u"lines"][u"1"], [u"Estação", u"B"])
+        self.assertEqual(schedule[u"lines"][u"3"], {u"empty": True})
+
+    def test_invalid(self):
+        for source in ['{"lines": {"1": [{"from": "A"}', '{"lines": {"1": [}}', '{"a" 1}', '']:
+            reader = ScheduleReader(StringIO(source), 4)
+            self.assertRaises(ValueError, reader.read)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_read', 'test_split_numbers', 'test_prepare_trip', 'test_invalid']
+    suite = unittest.TestSuite(map(TestCoreScheduleReader, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
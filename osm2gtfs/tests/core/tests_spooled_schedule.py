@@ -0,0 +1,89 @@
+# coding=utf-8
+
+import csv
+import unittest
+import zipfile
+from StringIO import StringIO
+import transitfeed
+from mock import patch
+from transitfeed import StopTime
+from osm2gtfs.core.spooled_schedule import SpooledSchedule, SpooledTrip
+from osm2gtfs.core.stop_times_spool import StopTimesSpool
+
+
+class TestCoreSpooledSchedule(unittest.TestCase):
+
+    def _add_trips(self, feed):
+        feed.AddAgency("Agency", "http://example.com", "America/Managua")
+        service_period = feed.GetDefaultServicePeriod()
+        service_period.SetWeekdayService(True)
+        service_period.SetStartDate("20180101")
+        service_period.SetEndDate("20181231")
+        stops = [feed.AddStop(12.0, -86.3 + i * 0.01, "Stop %s" % i) for i in range(3)]
+        route = feed.AddRoute("1", "Route", "Bus")
+        for i in range(12):
+            trip = route.AddTrip(feed, headsign="Stop 2", trip_id="trip_%02d" % (11 - i))
+            for j, stop in enumerate(stops):
+                time = 18000 + i * 600 + j * 300
+                trip.AddStopTime(stop, arrival_secs=time, departure_secs=time)
+
+    def test_stop_times_spool(self):
+        spool = StopTimesSpool(['trip_id', 'stop_id', 'stop_sequence'], 2)
+        spool.add_rows([("b", "B", 1), ("a", "C", 10), ("a", "B", 2), ("b", "A", 0),
+                        ("a", "A", 1)])
+        self.assertEqual(spool.get_runs_count(), 2)
+        self.assertEqual(list(spool.get_rows()), [
+            ("a", "A", 1), ("a", "B", 2), ("a", "C", 10), ("b", "A", 0), ("b", "B", 1)])
+        spool.close()
+        self.assertEqual(spool.get_runs_count(), 0)
+
+    def test_write(self):
+        # pylint: disable=protected-access
+        expected = StringIO()
+        feed = transitfeed.Schedule()
+        self._add_trips(feed)
+        feed.WriteGoogleTransitFeed(expected)
+
+        spooled = StringIO()
+        feed = SpooledSchedule(5)
+        self._add_trips(feed)
+        for trip in feed.GetTripList():
+            self.assertIsInstance(trip, SpooledTrip)
+
+        # transitfeed doesn't collect the stop times itself
+        write_archive_string = SpooledSchedule._WriteArchiveString
+        with patch.object(SpooledSchedule, "_WriteArchiveString", autospec=True,
+                          side_effect=write_archive_string) as write:
+            feed.WriteGoogleTransitFeed(spooled)
+        stop_times_strings = [call[0][3] for call in write.call_args_list
+                              if call[0][2] == "stop_times.txt"]
+        self.assertEqual(len(stop_times_strings), 1)
+        self.assertEqual(stop_times_strings[0].getvalue().splitlines(),
+                         [",".join(StopTime._FIELD_NAMES)])
+        self.assertIsNone(feed.stop_times_spool)
+        self.assertEqual(len(feed.GetTripList()[0].GetStopTimesTuples()), 3)
+
+        expected = zipfile.ZipFile(expected)
+        spooled = zipfile.ZipFile(spooled)
+        self.assertEqual(spooled.namelist(), expected.namelist())
+        for filename in expected.namelist():
+            if filename != 'stop_times.txt':
+                self.assertEqual(spooled.read(filename), expected.read(filename))
+
+        # The stop times are the same, but ordered by trip and sequence
+        rows = list(csv.reader(spooled.open('stop_times.txt')))
+        expected_rows = list(csv.reader(expected.open('stop_times.txt')))
+        self.assertEqual(rows[0], expected_rows[0])
+        self.assertEqual(rows[1:], sorted(expected_rows[1:], key=lambda row: (row[0], int(row[4]))))
+        self.assertEqual(len(rows), 37)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_stop_times_spool', 'test_write']
+    suite = unittest.TestSuite(map(TestCoreSpooledSchedule, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
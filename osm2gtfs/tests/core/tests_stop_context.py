@@ -0,0 +1,71 @@
+# coding=utf-8
+
+import unittest
+from osm2gtfs.core.elements import Station, Stop
+from osm2gtfs.core.stop_context import StopContext
+
+
+class CoreTestsFeed(object):
+    """
+    Stand-in for a GTFS feed with a dictionary of stops
+    """
+    def __init__(self, stops):
+        self.stops = stops
+
+
+class TestCoreStopContext(unittest.TestCase):
+
+    def setUp(self):
+        self.stops = {'regular': {}, 'stations': {}}
+        for osm_id, name in [(1, "Estação Norte"), (2, "Platform"), (3, "Alone")]:
+            self.stops['regular']["node/" + str(osm_id)] = Stop(
+                osm_id=osm_id, osm_type="node", osm_url="https://osm.org/node/" + str(osm_id),
+                tags={}, name=name, lat=0.0, lon=0.0, stop_id="node/" + str(osm_id))
+
+        for osm_id, name, members in [(10, "Terminal", ["node/1", "node/2"]),
+                                      (11, "Other", ["node/2"])]:
+            station = Station(osm_id=osm_id, osm_type="relation",
+                              osm_url="https://osm.org/relation/" + str(osm_id),
+                              tags={}, name=name, lat=0.0, lon=0.0)
+            station.set_members(dict(
+                (member, self.stops['regular'][member]) for member in members))
+            self.stops['stations']["relation/" + str(osm_id)] = station
+
+    def test_stop_context(self):
+        context = StopContext(self.stops)
+
+        self.assertIs(context.get_stop("node/3"), self.stops['regular']["node/3"])
+        self.assertIsNone(context.get_stop("node/4"))
+        self.assertEqual(context.get_name("node/1"), u"Estação Norte")
+        self.assertIsInstance(context.get_name("node/1"), unicode)
+
+        # Parent stations are resolved by the members of the stations
+        self.assertIs(context.get_parent_station("node/1"),
+                      self.stops['stations']["relation/10"])
+        self.assertEqual(context.get_parent_station_name("node/1"), u"Terminal")
+        self.assertIn(context.get_parent_station_name("node/2"), [u"Terminal", u"Other"])
+        self.assertIsNone(context.get_parent_station_name("node/3"))
+
+        # Members of stations, which aren't regular stops
+        del self.stops['regular']["node/2"]
+        context = StopContext(self.stops)
+        self.assertIsNone(context.get_stop("node/2"))
+        self.assertEqual(context.get_member("node/2").name, "Platform")
+        self.assertIsNone(context.get_member("node/3"))
+
+    def test_get_gtfs_stops(self):
+        context = StopContext(self.stops)
+        feed = CoreTestsFeed({"node/1": "GTFS stop 1", "node/3": "GTFS stop 3"})
+        self.assertEqual(context.get_gtfs_stops(feed),
+                         {"node/1": "GTFS stop 1", "node/3": "GTFS stop 3"})
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_stop_context', 'test_get_gtfs_stops']
+    suite = unittest.TestSuite(map(TestCoreStopContext, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
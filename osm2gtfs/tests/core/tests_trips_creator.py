@@ -0,0 +1,119 @@
+# coding=utf-8
+
+import unittest
+import transitfeed
+from osm2gtfs.creators.trips_creator import TripsCreator
+from osm2gtfs.tests.core.tests_configuration import CoreTestsArgs
+from osm2gtfs.core.configuration import Configuration
+from osm2gtfs.core.diagnostics import Diagnostics
+
+
+class CoreTestsGtfsObject(object):
+    """
+    Stand-in for GTFS routes, service periods and OSM itineraries
+    """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TestCoreTripsCreator(unittest.TestCase):
+
+    def setUp(self):
+        Diagnostics.reset()
+        self.stops = [transitfeed.Stop(lat=12.0, lng=lng, name=stop_id, stop_id=stop_id)
+                      for stop_id, lng in [("A", -86.30), ("B", -86.29), ("C", -86.27)]]
+
+    def tearDown(self):
+        Diagnostics.reset()
+
+    def _get_trips_creator(self, trips_config):
+        return TripsCreator(Configuration(CoreTestsArgs({
+            'selector': "tests_core_trips",
+            'feed_info': {'start_date': "20180101", 'end_date': "20181231"},
+            'trips': trips_config,
+        })))
+
+    def _get_trip(self, start_time, travel_times=(600, 1500)):
+        return [(self.stops[0], start_time), (self.stops[1], None),
+                (self.stops[2], start_time + travel_times[1])]
+
+    def test_compact_by_headways(self):
+        # pylint: disable=protected-access
+        creator = self._get_trips_creator({'detect_headways': "yes"})
+        self.assertTrue(creator.detect_headways)
+
+        # Every 10 minutes from 05:00, then two irregular departures and a
+        # trip with other travel times
+        trips = [self._get_trip(18000 + i * 600) for i in range(6)]
+        trips += [self._get_trip(25200), self._get_trip(26000)]
+        trips.append(self._get_trip(18600, (600, 1800)))
+
+        trips = [creator._get_trip_pattern(stop_times) for stop_times in trips]
+        pattern = trips[0][0]
+        self.assertIs(trips[7][0], pattern)
+        self.assertIsNot(trips[8][0], pattern)
+
+        compacted = creator._compact_by_headways(trips)
+        self.assertEqual(compacted, [
+            (pattern, 18000, (21600, 600)),
+            (pattern, 25200, None),
+            (pattern, 26000, None),
+            (trips[8][0], 18600, None),
+        ])
+
+        # Runs need a minimal amount of trips
+        creator = self._get_trips_creator({'detect_headways': "yes", 'headway_min_trips': 7})
+        self.assertEqual(len(creator._compact_by_headways(trips)), len(trips))
+
+    def test_trip_pattern(self):
+        # pylint: disable=protected-access
+        creator = self._get_trips_creator({})
+        pattern, start_time = creator._get_trip_pattern(self._get_trip(18000))
+        self.assertEqual(start_time, 18000)
+        self.assertEqual(pattern.offsets, (0, None, 1500))
+        self.assertTrue(pattern.is_complete())
+
+        # Times of stops without time information are interpolated by distance
+        self.assertEqual(pattern.get_stop_times(21600), [
+            (self.stops[0], 21600), (self.stops[1], 22100), (self.stops[2], 23100)])
+
+        # Trips without stop times don't have a pattern
+        self.assertEqual(creator._get_trip_pattern([]), (None, None))
+
+    def test_drop_duplicate_trips(self):
+        # pylint: disable=protected-access
+        creator = self._get_trips_creator({})
+        itinerary = CoreTestsGtfsObject(osm_type="relation", osm_id=1)
+        route = CoreTestsGtfsObject(route_id="1")
+        weekdays = {'service_period': CoreTestsGtfsObject(service_id="Mo-Fr")}
+        saturdays = {'service_period': CoreTestsGtfsObject(service_id="Sa")}
+
+        trips = [creator._get_trip_pattern(self._get_trip(start_time))
+                 for start_time in [18000, 18600, 18000]]
+        trips.append((None, None))
+        unique_trips = creator._drop_duplicate_trips(itinerary, route, weekdays, trips)
+        self.assertEqual(unique_trips, [trips[0], trips[1], (None, None)])
+        self.assertEqual(Diagnostics.get_count(Diagnostics.DUPLICATE_TRIP), 1)
+
+        # Trips of the same itinerary listed again under the same service
+        # are dropped, under other services they are kept
+        self.assertEqual(creator._drop_duplicate_trips(itinerary, route, weekdays, trips), [
+            (None, None)])
+        self.assertEqual(creator._drop_duplicate_trips(itinerary, route, saturdays, trips),
+                         unique_trips)
+        self.assertEqual(Diagnostics.get_count(Diagnostics.DUPLICATE_TRIP), 5)
+
+    def test_headways_disabled(self):
+        self.assertFalse(self._get_trips_creator({}).detect_headways)
+
+
+def load_tests(loader, tests, pattern):
+    # pylint: disable=unused-argument
+    test_cases = ['test_compact_by_headways', 'test_trip_pattern',
+                  'test_drop_duplicate_trips', 'test_headways_disabled']
+    suite = unittest.TestSuite(map(TestCoreTripsCreator, test_cases))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main()
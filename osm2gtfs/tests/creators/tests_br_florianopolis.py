@@ -1,12 +1,15 @@
 import unittest
 import os
 import logging
+from datetime import datetime
 import overpy
 
 from mock import patch
 from osm2gtfs.tests.creators.creators_tests import CreatorsTestsAbstract
 from osm2gtfs.core.osm_connector import OsmConnector
 from osm2gtfs.core.cache import Cache
+from osm2gtfs.creators.br_florianopolis.trips_creator_br_florianopolis import (
+    TripsCreatorBrFlorianopolis, StopNameIndex, SATURDAY, SUNDAY)
 
 # Define logging level
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
@@ -62,10 +65,41 @@ class TestCreatorsBrFlorianopolis(CreatorsTestsAbstract):
             len(routes), self.required_variables['routes_count'] + 9,
             'Wrong count of routes in the cache file')
 
+    def test_stop_name_index(self):
+        normalize = TripsCreatorBrFlorianopolis.normalize_stop_name
+        index = StopNameIndex(["TICEN Plataforma B", "Terminal Centro", "Rua Joao Pio Duarte"],
+                              normalize)
+
+        # The first of the names with the same normalized name is used
+        self.assertEqual(index.get(u"TICEN"), (0, "TICEN Plataforma B"))
+        self.assertIsNone(index.get(u"Rua Joao Pio"))
+
+        # Names, which are nearly the same
+        self.assertEqual(index.get_similar(u"Rua Jo\u00e3o Pio Duarte", 0.7),
+                         (2, "Rua Joao Pio Duarte"))
+        self.assertIsNone(index.get_similar(u"Avenida Beira Mar", 0.7))
+
+    def test_exceptions_as_calendar_dates(self):
+        self.config.data['schedule_exceptions'] = "calendar_dates"
+        self.config.data['feed_info']['start_date'] = "20170101"
+        self.config.data['feed_info']['end_date'] = "20171231"
+        creator = TripsCreatorBrFlorianopolis(self.config)
+
+        # A Tuesday served like a Sunday
+        creator.add_exception_dates(datetime(2017, 12, 26), SUNDAY)
+        self.assertFalse(creator.service_weekday.IsActiveOn("20171226"))
+        self.assertTrue(creator.service_sunday.IsActiveOn("20171226"))
+
+        # A Saturday served like a Saturday doesn't change
+        creator.add_exception_dates(datetime(2017, 12, 30), SATURDAY)
+        self.assertTrue(creator.service_saturday.IsActiveOn("20171230"))
+        self.assertEqual(creator.service_saturday.date_exceptions, {})
+
 
 def load_tests(loader, tests, pattern):
     # pylint: disable=unused-argument
-    test_cases = ['test_refresh_routes_cache', 'test_refresh_stops_cache', 'test_gtfs_from_cache']
+    test_cases = ['test_refresh_routes_cache', 'test_refresh_stops_cache', 'test_gtfs_from_cache',
+                  'test_stop_name_index', 'test_exceptions_as_calendar_dates']
     suite = unittest.TestSuite(map(TestCreatorsBrFlorianopolis, test_cases))
     return suite
 
@@ -2,6 +2,7 @@ import os
 import unittest
 import logging
 from osm2gtfs.tests.creators.creators_tests import CreatorsTestsAbstract
+from osm2gtfs.creators.ci_abidjan.trips_creator_ci_abidjan import TripsCreatorCiAbidjan
 
 # Define logging level
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
@@ -29,11 +30,27 @@ class TestCreatorsCiAbidjan(CreatorsTestsAbstract):
     def _override_configuration(self):
         self.config.data['stops']['name_auto'] = "no"
 
+    def test_transport_hours(self):
+        # pylint: disable=protected-access
+        creator = TripsCreatorCiAbidjan(self.config)
+
+        # Hours are parsed once for the same relevant tags
+        hours = creator._get_transport_hours(
+            {'opening_hours': "Mo-Fr 06:00-20:00", 'interval': "00:20", 'name': "A"})
+        self.assertIs(creator._get_transport_hours(
+            {'opening_hours': "Mo-Fr 06:00-20:00", 'interval': "00:20", 'name': "B"}), hours)
+        self.assertEqual(hours[0]['headway'], 1200)
+
+        self.assertEqual(creator._service_id_from_transport_hour(hours[0]), "Mo-Fr")
+        self.assertEqual(creator._service_id_from_transport_hour(
+            {'monday': True, 'wednesday': True, 'sunday': True}), "Mo,We,Su")
+        self.assertEqual(creator._service_id_from_transport_hour({}), "Mo-Su")
+
 
 def load_tests(loader, tests, pattern):
     # pylint: disable=unused-argument
     test_cases = ['test_refresh_routes_cache',
-                  'test_refresh_stops_cache', 'test_gtfs_from_cache']
+                  'test_refresh_stops_cache', 'test_gtfs_from_cache', 'test_transport_hours']
     suite = unittest.TestSuite(map(TestCreatorsCiAbidjan, test_cases))
     return suite
 
@@ -1,7 +1,9 @@
 import os
 import unittest
 import logging
+import transitfeed
 from osm2gtfs.tests.creators.creators_tests import CreatorsTestsAbstract
+from osm2gtfs.creators.trips_creator import TripsCreator
 
 # Define logging level
 logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
@@ -29,10 +31,22 @@ class TestCreatorsGhAccra(CreatorsTestsAbstract):
     def _override_configuration(self):
         self.config.data['stops']['name_auto'] = "no"
 
+    def test_frequency_stop_times(self):
+        # pylint: disable=protected-access
+        stops = [transitfeed.Stop(lat=5.55, lng=lng, name=str(i), stop_id=str(i))
+                 for i, lng in enumerate([-0.20, -0.19, -0.17, -0.16])]
+
+        # Times of the stops in between are interpolated by distance
+        self.assertEqual(TripsCreator._get_frequency_stop_times(stops, 21600, 3600),
+                         [21600, 22500, 24300, 25200])
+        self.assertEqual(TripsCreator._get_frequency_stop_times(stops[:1], 21600, 3600),
+                         [21600])
+
 
 def load_tests(loader, tests, pattern):
     # pylint: disable=unused-argument
-    test_cases = ['test_refresh_routes_cache', 'test_refresh_stops_cache', 'test_gtfs_from_cache']
+    test_cases = ['test_refresh_routes_cache', 'test_refresh_stops_cache', 'test_gtfs_from_cache',
+                  'test_frequency_stop_times']
     suite = unittest.TestSuite(map(TestCreatorsGhAccra, test_cases))
     return suite
 